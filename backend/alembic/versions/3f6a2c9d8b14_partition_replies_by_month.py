@@ -0,0 +1,110 @@
+"""Partition replies by month on created_at
+
+Revision ID: 3f6a2c9d8b14
+Revises: 924ea4e80382
+Create Date: 2026-10-19 09:12:41.318204
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+from app.partitions import add_months, month_start, months_between, partition_ddl
+
+# revision identifiers, used by Alembic.
+revision = '3f6a2c9d8b14'
+down_revision = '924ea4e80382'
+branch_labels = None
+depends_on = None
+
+REPLY_INDEXES = [
+    ('ix_replies_created_at', ['created_at']),
+    ('ix_replies_tone_type', ['tone_type']),
+    ('ix_replies_service_type', ['service_type']),
+    ('ix_replies_user_id', ['user_id']),
+]
+
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.execute(sa.text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
+
+
+def _is_partitioned(conn) -> bool:
+    return conn.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'replies' AND pg_table_is_visible(c.oid)"
+    )).scalar() is not None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, 'replies') and _is_partitioned(conn):
+        return
+
+    had_legacy_table = _table_exists(conn, 'replies')
+    if had_legacy_table:
+        # Free the relation-level names (pkey + indexes) so the partitioned table can reuse them
+        op.rename_table('replies', 'replies_unpartitioned')
+        op.execute('ALTER TABLE replies_unpartitioned DROP CONSTRAINT IF EXISTS replies_pkey')
+        for index_name, _ in REPLY_INDEXES:
+            op.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+    op.create_table('replies',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('service_type', sa.String(), nullable=False),
+    sa.Column('tone_type', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='replies_user_id_fkey'),
+    sa.PrimaryKeyConstraint('id', 'created_at', name='replies_pkey'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    for index_name, columns in REPLY_INDEXES:
+        op.create_index(index_name, 'replies', columns, unique=False)
+    op.create_index('ix_replies_user_id_created_at', 'replies', ['user_id', 'created_at'], unique=False)
+
+    now = datetime.utcnow()
+    first_month = now
+    if had_legacy_table:
+        oldest = conn.execute(sa.text('SELECT min(created_at) FROM replies_unpartitioned')).scalar()
+        if oldest is not None:
+            first_month = oldest
+    for month in months_between(first_month, add_months(month_start(now), settings.replies_partition_months_ahead)):
+        op.execute(partition_ddl(month))
+
+    if had_legacy_table:
+        op.execute(
+            "INSERT INTO replies (id, user_id, service_type, tone_type, created_at) "
+            "SELECT id, user_id, service_type, tone_type, COALESCE(created_at, now() AT TIME ZONE 'utc') "
+            "FROM replies_unpartitioned"
+        )
+        op.drop_table('replies_unpartitioned')
+
+
+def downgrade() -> None:
+    op.rename_table('replies', 'replies_partitioned')
+    op.execute('ALTER TABLE replies_partitioned DROP CONSTRAINT IF EXISTS replies_pkey')
+    for index_name, _ in REPLY_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {index_name}')
+    op.execute('DROP INDEX IF EXISTS ix_replies_user_id_created_at')
+
+    op.create_table('replies',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('service_type', sa.String(), nullable=False),
+    sa.Column('tone_type', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='replies_user_id_fkey'),
+    sa.PrimaryKeyConstraint('id', name='replies_pkey')
+    )
+    for index_name, columns in REPLY_INDEXES:
+        op.create_index(index_name, 'replies', columns, unique=False)
+
+    op.execute(
+        "INSERT INTO replies (id, user_id, service_type, tone_type, created_at) "
+        "SELECT id, user_id, service_type, tone_type, created_at FROM replies_partitioned"
+    )
+    # Dropping the parent drops every attached partition with it
+    op.drop_table('replies_partitioned')
@@ -0,0 +1,39 @@
+"""Add reply_daily_rollups and backfill from replies
+
+Revision ID: 7c1e5b2a9d40
+Revises: 3f6a2c9d8b14
+Create Date: 2026-10-19 11:40:06.552917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7c1e5b2a9d40'
+down_revision = '3f6a2c9d8b14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    # The app's create_all may already have created the empty table
+    if conn.execute(sa.text("SELECT to_regclass('reply_daily_rollups')")).scalar() is None:
+        op.create_table('reply_daily_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('service_type', sa.String(), nullable=False),
+        sa.Column('tone_type', sa.String(), nullable=False),
+        sa.Column('reply_count', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'service_type', 'tone_type', name='reply_daily_rollups_pkey')
+        )
+    # One-off O(rows) aggregation; every later read is O(days)
+    op.execute(
+        "INSERT INTO reply_daily_rollups (day, service_type, tone_type, reply_count) "
+        "SELECT created_at::date, service_type, COALESCE(tone_type, ''), count(*) "
+        "FROM replies GROUP BY 1, 2, 3 "
+        "ON CONFLICT (day, service_type, tone_type) DO UPDATE SET reply_count = EXCLUDED.reply_count"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reply_daily_rollups')
@@ -0,0 +1,34 @@
+"""Add reply_ingest_keys for idempotent batch ingestion
+
+Revision ID: b84d1f0e6c27
+Revises: 7c1e5b2a9d40
+Create Date: 2026-10-19 14:05:12.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b84d1f0e6c27'
+down_revision = '7c1e5b2a9d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    # The app's create_all may already have created it
+    if conn.execute(sa.text("SELECT to_regclass('reply_ingest_keys')")).scalar() is not None:
+        return
+    op.create_table('reply_ingest_keys',
+    sa.Column('scope', sa.String(), nullable=False),
+    sa.Column('client_event_id', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('scope', 'client_event_id', name='reply_ingest_keys_pkey')
+    )
+    op.create_index(op.f('ix_reply_ingest_keys_created_at'), 'reply_ingest_keys', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_reply_ingest_keys_created_at'), table_name='reply_ingest_keys')
+    op.drop_table('reply_ingest_keys')
@@ -0,0 +1,41 @@
+"""Add reply_rollup_deltas so reply writes append instead of upserting rollups
+
+Revision ID: c5e0a7d3f912
+Revises: b84d1f0e6c27
+Create Date: 2026-10-19 14:32:47.902113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c5e0a7d3f912'
+down_revision = 'b84d1f0e6c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    # The app's create_all may already have created it
+    if conn.execute(sa.text("SELECT to_regclass('reply_rollup_deltas')")).scalar() is not None:
+        return
+    op.create_table('reply_rollup_deltas',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('service_type', sa.String(), nullable=False),
+    sa.Column('tone_type', sa.String(), nullable=False),
+    sa.Column('reply_count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name='reply_rollup_deltas_pkey')
+    )
+
+
+def downgrade() -> None:
+    # Fold what is left so no counts are lost
+    op.execute(
+        "INSERT INTO reply_daily_rollups (day, service_type, tone_type, reply_count) "
+        "SELECT day, service_type, tone_type, sum(reply_count) FROM reply_rollup_deltas GROUP BY 1, 2, 3 "
+        "ON CONFLICT (day, service_type, tone_type) "
+        "DO UPDATE SET reply_count = reply_daily_rollups.reply_count + EXCLUDED.reply_count"
+    )
+    op.drop_table('reply_rollup_deltas')
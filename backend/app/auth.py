@@ -2,8 +2,11 @@ from fastapi import HTTPException, Depends, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from typing import Optional, Dict, Any
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
-from app.database import get_supabase_client
+from app.database import get_supabase_client, get_db
+from app.models import User
 
 security = HTTPBearer()
 optional_security = HTTPBearer(auto_error=False)
@@ -69,4 +72,20 @@ async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials]
         return user
     except HTTPException:
         # If token validation fails, just return None instead of raising an error
-        return None
\ No newline at end of file
+        return None
+
+async def get_current_admin(
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Dependency requiring an active local user with the admin role"""
+    result = await db.execute(
+        select(User).where(User.supabase_user_id == current_user["id"])
+    )
+    user = result.scalar_one_or_none()
+    if not user or not user.is_active or user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user
\ No newline at end of file
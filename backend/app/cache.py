@@ -1,9 +1,19 @@
 import asyncio
 import json
 import logging
-from typing import Any, Optional, Callable, Awaitable
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Callable, Awaitable
 
+from app.cache_codecs import CodecError, codec_from_settings
 from app.config import settings
+from app.memory_cache import MemoryRedis
+from app.metrics import counter, gauge
+from app.query_stats import without_query_stats
 
 try:
     import redis.asyncio as redis  # type: ignore
@@ -12,65 +22,863 @@ except ImportError:  # pragma: no cover
 
 logger = logging.getLogger(__name__)
 
+# Generation counters must outlive any entry written under them (entry TTLs are minutes)
+VERSION_TTL_SECONDS = 30 * 86400
+
+# Values written by RedisCache.cached are wrapped with their logical expiry and load time
+ENVELOPE_MARKER = "__cache__"
+LOCK_POLL_SECONDS = 0.05
+# Compare-and-delete so a loader never releases a lock that expired and was re-taken
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+cache_loader_calls = counter(
+    "cache_loader_calls_total", "Loader invocations by RedisCache.cached", ["namespace"]
+)
+cache_stale_served = counter(
+    "cache_stale_served_total", "Expired values served while a background refresh runs", ["namespace"]
+)
+redis_connection_failures = counter(
+    "redis_connection_failures_total", "Redis calls that failed with a connection or timeout error"
+)
+redis_reconnects = counter(
+    "redis_reconnects_total", "Times the Redis circuit breaker closed again after an outage"
+)
+cache_negative_hits = counter(
+    "cache_negative_hits_total", "Lookups answered by a cached 'not found' (database calls saved)", ["namespace"]
+)
+cache_requests = counter(
+    "cache_requests_total", "Cache lookups by namespace and outcome (l1_hit, l2_hit, miss)",
+    ["namespace", "result"]
+)
+
+class LRUCache:
+    """Bounded in-process cache with per-entry TTL and least-recently-used eviction.
+
+    Plain dict operations only (no awaits), so it is safe to share across
+    coroutines on one event loop.
+    """
+
+    MISSING = object()
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        """Value for key, or LRUCache.MISSING if absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return self.MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return self.MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def jittered_ttl(ttl_seconds: int) -> int:
+    """Spread TTLs by +/- cache_ttl_jitter so keys written together don't expire together."""
+    jitter = settings.cache_ttl_jitter
+    if jitter <= 0:
+        return ttl_seconds
+    return max(1, round(ttl_seconds * random.uniform(1 - jitter, 1 + jitter)))
+
+def is_envelope(entry: Any) -> bool:
+    return isinstance(entry, dict) and ENVELOPE_MARKER in entry
+
+def is_negative(entry: Any) -> bool:
+    return is_envelope(entry) and bool(entry.get("negative"))
+
+def unwrap(entry: Any) -> Any:
+    return entry["value"] if is_envelope(entry) else entry
+
+def parse_namespace_sizes(spec: str) -> Dict[str, tuple]:
+    """`prefix=entries[/ttl],...` -> {prefix: (entries, ttl or None)}"""
+    sizes = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        prefix, _, size = item.rpartition("=")
+        entries, _, ttl = size.partition("/")
+        sizes[prefix] = (int(entries), float(ttl) if ttl else None)
+    return sizes
+
+class L1Cache:
+    """Per-namespace LRU tiers; a key belongs to the longest matching configured prefix.
+
+    Values are shared between callers, so treat them as read-only.
+    """
+
+    DEFAULT_NAMESPACE = "default"
+
+    def __init__(self, max_entries: int, ttl_seconds: float, namespace_sizes: Dict[str, tuple]):
+        self.ttl_seconds = ttl_seconds
+        self._default = LRUCache(max_entries, ttl_seconds)
+        self._namespaces: Dict[str, LRUCache] = {}
+        for prefix, (entries, ttl) in namespace_sizes.items():
+            self.configure(prefix, entries, ttl)
+
+    def configure(self, prefix: str, max_entries: int, ttl_seconds: Optional[float] = None) -> None:
+        self._namespaces[prefix] = LRUCache(max_entries, ttl_seconds or self.ttl_seconds)
+        # Longest prefix first so the most specific namespace wins
+        self._namespaces = dict(sorted(self._namespaces.items(), key=lambda item: -len(item[0])))
+
+    def namespace_of(self, key: str) -> str:
+        for prefix in self._namespaces:
+            if key.startswith(prefix):
+                return prefix
+        return self.DEFAULT_NAMESPACE
+
+    def tier(self, namespace: str) -> LRUCache:
+        return self._namespaces.get(namespace, self._default)
+
+    def get(self, key: str, namespace: str) -> Any:
+        return self.tier(namespace).get(key)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        self.tier(self.namespace_of(key)).set(key, value, ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self.tier(self.namespace_of(key)).delete(key)
+
+    def clear(self) -> None:
+        self._default.clear()
+        for tier in self._namespaces.values():
+            tier.clear()
+
+    def sizes(self) -> Dict[str, int]:
+        sizes = {prefix: len(tier) for prefix, tier in self._namespaces.items()}
+        sizes[self.DEFAULT_NAMESPACE] = len(self._default)
+        return sizes
+
 class RedisCache:
     def __init__(self):
         # Use Any to avoid typing issues if redis is None/not installed at runtime
         self._client: Optional[Any] = None
         self._lock = asyncio.Lock()
+        # Circuit breaker: "connecting" until the first attempt, then "up" or "down"
+        self._state = "connecting"
+        self._failures: deque = deque()
+        self._down_since: Optional[float] = None
+        self._next_retry_at: Optional[float] = None
+        self._reconnects = 0
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self.l1 = L1Cache(
+            settings.cache_l1_max_entries,
+            settings.cache_l1_ttl_seconds,
+            parse_namespace_sizes(settings.cache_l1_namespace_sizes)
+        )
+        # L1 is only trusted while this worker is subscribed to invalidations
+        self._l1_live = False
+        self._instance_id = uuid.uuid4().hex
+        self.codec = codec_from_settings(
+            settings.cache_serializer,
+            settings.cache_compression,
+            settings.cache_compress_min_bytes,
+            settings.cache_compression_level
+        )
+        # Singleflight: at most one loader per key in this process
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        # In-process backend: used when Redis is off, or (auto) while it is down
+        self._memory: Optional[MemoryRedis] = None
+
+    def _build_client(self) -> Any:
+        pool = redis.BlockingConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout_seconds,
+            socket_timeout=settings.redis_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_socket_connect_timeout_seconds,
+            health_check_interval=settings.redis_health_check_interval_seconds,
+            # Raw bytes: values go through the configured codec (app/cache_codecs.py)
+            decode_responses=False,
+        )
+        return redis.Redis(connection_pool=pool)
+
+    def _redis_configured(self) -> bool:
+        return settings.cache_backend != "memory" and settings.redis_enabled and redis is not None
+
+    @property
+    def backend(self) -> str:
+        """Where commands go right now: redis, memory, memory-fallback or none."""
+        if self._redis_configured():
+            if self._state != "down":
+                return "redis"
+            return "memory-fallback" if settings.cache_backend == "auto" else "none"
+        return "none" if settings.cache_backend == "redis" else "memory"
+
+    def _memory_client(self) -> MemoryRedis:
+        if self._memory is None:
+            self._memory = MemoryRedis(settings.memory_cache_max_bytes, settings.memory_cache_max_ttl_seconds)
+        return self._memory
 
     async def get_client(self) -> Optional[Any]:
-        if not settings.redis_enabled or not redis:
+        """Client for cache commands, or None when no backend is available.
+
+        Redis when enabled and reachable. With cache_backend="auto" the
+        in-process MemoryRedis stands in when Redis is disabled, not installed,
+        or behind an open circuit breaker; "memory" always uses it and "redis"
+        never does.
+        """
+        if not self._redis_configured():
+            return None if settings.cache_backend == "redis" else self._memory_client()
+        client = await self._get_redis()
+        if client is None and settings.cache_backend == "auto":
+            return self._memory_client()
+        return client
+
+    async def _get_redis(self) -> Optional[Any]:
+        """Pooled Redis client, or None while Redis is disabled or the circuit breaker is open.
+
+        Only the very first call connects inline. After a failure, calls return
+        None immediately and a background task retries with exponential backoff,
+        so requests never wait on connect timeouts while Redis is down.
+        """
+        if not self._redis_configured():
+            return None
+        if self._state == "down":
             return None
         if self._client is None:
             async with self._lock:
-                if self._client is None:  # double-checked locking
+                if self._client is None and self._state != "down":  # double-checked locking
+                    client = self._build_client()
                     try:
-                        self._client = redis.Redis(
-                            host=settings.redis_host,
-                            port=settings.redis_port,
-                            db=settings.redis_db,
-                            encoding="utf-8",
-                            decode_responses=True,
-                        )
-                        # Ping to verify
-                        await self._client.ping()
+                        await client.ping()
+                        self._client = client
+                        self._state = "up"
                         logger.info("Redis cache connected")
-                    except Exception as e:  # pragma: no cover
-                        logger.warning(f"Redis connection failed, disabling cache: {e}")
-                        self._client = None
+                    except Exception as e:
+                        self._client = client
+                        redis_connection_failures.inc()
+                        self._trip(e)
+                        return None
         return self._client
 
-    async def get_json(self, key: str) -> Optional[Any]:
+    @staticmethod
+    def _is_connection_error(error: Exception) -> bool:
+        if not redis:
+            return False
+        if isinstance(error, redis.ConnectionError) and isinstance(error.__cause__, asyncio.TimeoutError):
+            return False  # Pool exhausted (BlockingConnectionPool wait timed out): busy, not down
+        return isinstance(error, (redis.ConnectionError, redis.TimeoutError, OSError, asyncio.TimeoutError))
+
+    def _record_failure(self, error: Exception) -> None:
+        """Count connection-level failures; enough of them inside the window opens the breaker."""
+        if not self._is_connection_error(error):
+            return
+        redis_connection_failures.inc()
+        now = time.monotonic()
+        self._failures.append(now)
+        while self._failures and self._failures[0] < now - settings.redis_failure_window_seconds:
+            self._failures.popleft()
+        if len(self._failures) >= settings.redis_failure_threshold:
+            self._trip(error)
+
+    def _trip(self, error: Exception) -> None:
+        if self._state == "down":
+            return
+        self._state = "down"
+        self._down_since = time.time()
+        self._failures.clear()
+        self._flush_memory()
+        logger.warning(f"Redis unavailable, bypassing cache until it recovers: {error}")
+        self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        delay = settings.redis_retry_backoff_seconds
+        while True:
+            self._next_retry_at = time.time() + delay
+            await asyncio.sleep(delay)
+            try:
+                await self._client.ping()
+            except Exception as e:
+                logger.debug(f"Redis reconnect attempt failed: {e}")
+                delay = min(delay * 2, settings.redis_retry_backoff_max_seconds)
+                continue
+            outage = time.time() - self._down_since
+            self._state = "up"
+            self._down_since = None
+            self._next_retry_at = None
+            self._reconnects += 1
+            redis_reconnects.inc()
+            # Fallback entries were only seen by this worker; don't let a later outage serve them
+            self._flush_memory()
+            logger.info(f"Redis reconnected after {outage:.1f}s")
+            return
+
+    def _flush_memory(self) -> None:
+        if self._memory is not None and settings.cache_backend == "auto" and self._redis_configured():
+            self._memory.clear()
+
+    def status(self) -> Dict[str, Any]:
+        """Breaker state for /health: disabled, connecting (not tried yet), up or down."""
+        if not self._redis_configured():
+            state = "disabled"
+        else:
+            state = self._state
+        return {
+            "backend": self.backend,
+            "memory": self._memory.stats() if self._memory is not None else None,
+            "state": state,
+            "reconnects": self._reconnects,
+            "down_since": datetime.fromtimestamp(self._down_since, timezone.utc).isoformat() if self._down_since else None,
+            "next_retry_in_seconds": round(max(0.0, self._next_retry_at - time.time()), 1) if self._next_retry_at else None,
+        }
+
+    @property
+    def l1_active(self) -> bool:
+        return settings.cache_l1_enabled and self._l1_live
+
+    def _l1_lookup(self, key: str) -> Any:
+        namespace = self.l1.namespace_of(key)
+        value = self.l1.get(key, namespace) if self.l1_active else LRUCache.MISSING
+        if value is not LRUCache.MISSING:
+            cache_requests.inc(namespace=namespace, result="l1_hit")
+        return value
+
+    def _record_l2(self, key: str, hit: bool) -> None:
+        cache_requests.inc(namespace=self.l1.namespace_of(key), result="l2_hit" if hit else "miss")
+
+    def _l1_store(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        if self.l1_active:
+            self.l1.set(key, value, ttl_seconds)
+
+    async def _get_remote(self, key: str) -> Optional[Any]:
         client = await self.get_client()
         if not client:
             return None
         try:
             raw = await client.get(key)
-            if raw is None:
-                return None
-            return json.loads(raw)
+            return self.codec.decode(raw) if raw is not None else None
         except Exception as e:  # pragma: no cover
             logger.debug(f"Redis get failed for {key}: {e}")
+            self._record_failure(e)
+            return None
+
+    async def _get_entry(self, key: str) -> Optional[Any]:
+        """Stored object for key (possibly an envelope): L1, then Redis."""
+        entry = self._l1_lookup(key)
+        if entry is not LRUCache.MISSING:
+            return entry
+        if not await self.get_client():
             return None
+        entry = await self._get_remote(key)
+        self._record_l2(key, entry is not None)
+        if entry is not None:
+            self._l1_store(key, entry)
+        return entry
 
-    async def set_json(self, key: str, value: Any, ttl_seconds: int) -> None:
+    async def get_json(self, key: str) -> Optional[Any]:
+        return unwrap(await self._get_entry(key))
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Fetch several JSON values (L1 first, then one MGET); missing keys are left out."""
+        values = {}
+        remote_keys = []
+        for key in keys:
+            value = self._l1_lookup(key)
+            if value is LRUCache.MISSING:
+                remote_keys.append(key)
+            else:
+                values[key] = unwrap(value)
+        client = await self.get_client()
+        if not client or not remote_keys:
+            return values
+        try:
+            raw_values = await client.mget(remote_keys)
+        except Exception as e:  # pragma: no cover
+            logger.debug(f"Redis mget failed for {remote_keys}: {e}")
+            self._record_failure(e)
+            return values
+        for key, raw in zip(remote_keys, raw_values):
+            self._record_l2(key, raw is not None)
+            if raw is None:
+                continue
+            try:
+                entry = self.codec.decode(raw)
+                self._l1_store(key, entry)
+                values[key] = unwrap(entry)
+            except CodecError as e:  # pragma: no cover
+                logger.debug(f"Redis value for {key} could not be decoded: {e}")
+        return values
+
+    async def _store(self, key: str, entry: Any, ttl_seconds: int, publish: bool) -> None:
         client = await self.get_client()
         if not client:
             return
         try:
-            await client.set(key, json.dumps(value), ex=ttl_seconds)
+            await client.set(key, self.codec.encode(entry), ex=ttl_seconds)
+            self._l1_store(key, entry, ttl_seconds)
+            if publish:
+                await self.publish_invalidation(key)
         except Exception as e:  # pragma: no cover
             logger.debug(f"Redis set failed for {key}: {e}")
+            self._record_failure(e)
+
+    async def set_json(self, key: str, value: Any, ttl_seconds: int, publish: bool = True) -> None:
+        """Write a value. publish=False for read-through fills: the value is
+        the same data other workers may already hold, so evicting their L1
+        copies would only cost them a round trip (and a pub/sub message per miss)."""
+        await self._store(key, value, jittered_ttl(ttl_seconds), publish)
+
+    async def _pipeline(self, queue: Callable[[Any], None]) -> Optional[List[Any]]:
+        """Run the commands queued by `queue(pipe)` in one round trip.
+
+        Returns one result per command, with the exception in place of any
+        command that failed, or None if Redis is unavailable or the round trip
+        itself failed.
+        """
+        client = await self.get_client()
+        if not client:
+            return None
+        try:
+            pipe = client.pipeline(transaction=False)
+            queue(pipe)
+            return await pipe.execute(raise_on_error=False)
+        except Exception as e:  # pragma: no cover
+            logger.debug(f"Redis pipeline failed: {e}")
+            self._record_failure(e)
+            return None
+
+    async def set_many(self, entries: Dict[str, Any], ttl_seconds: int) -> Dict[str, bool]:
+        """SET several values in one pipelined round trip; returns whether each key was stored."""
+        if not entries:
+            return {}
+        encoded = {key: self.codec.encode(value) for key, value in entries.items()}
+        ttls = {key: jittered_ttl(ttl_seconds) for key in entries}
+        results = await self._pipeline(
+            lambda pipe: [pipe.set(key, data, ex=ttls[key]) for key, data in encoded.items()]
+        )
+        if results is None:
+            return {key: False for key in entries}
+        stored = {key: not isinstance(result, Exception) for key, result in zip(entries, results)}
+        for key, ok in stored.items():
+            if ok:
+                self._l1_store(key, entries[key], ttls[key])
+        if any(stored.values()):
+            await self.publish_invalidation(*[key for key, ok in stored.items() if ok])
+        return stored
+
+    async def delete_many(self, keys: List[str]) -> Dict[str, bool]:
+        """DEL keys in one pipelined round trip; returns whether each delete succeeded."""
+        for key in keys:
+            self.l1.delete(key)
+        if not keys:
+            return {}
+        results = await self._pipeline(lambda pipe: [pipe.delete(key) for key in keys])
+        if results is None:
+            return {key: False for key in keys}
+        deleted = {key: not isinstance(result, Exception) for key, result in zip(keys, results)}
+        if any(deleted.values()):
+            await self.publish_invalidation(*[key for key, ok in deleted.items() if ok])
+        return deleted
+
+    async def delete(self, *keys: str) -> None:
+        await self.delete_many(list(keys))
 
-    async def cached(self, key: str, ttl_seconds: int, loader: Callable[[], Awaitable[Any]]):
-        # Try cache
-        cached_value = await self.get_json(key)
-        if cached_value is not None:
-            return cached_value, True
-        # Load fresh
-        data = await loader()
-        # Store
-        await self.set_json(key, data, ttl_seconds)
-        return data, False
+    async def incr_many(self, keys: List[str], amount: int = 1,
+                        ttl_seconds: Optional[int] = None) -> Dict[str, Optional[int]]:
+        """INCRBY each key (and refresh its TTL) in one round trip; None where a key failed."""
+        if not keys:
+            return {}
+
+        def queue(pipe):
+            for key in keys:
+                pipe.incrby(key, amount)
+                if ttl_seconds:
+                    pipe.expire(key, ttl_seconds)
+
+        results = await self._pipeline(queue)
+        if results is None:
+            return {key: None for key in keys}
+        step = 2 if ttl_seconds else 1
+        return {
+            key: None if isinstance(result, Exception) else int(result)
+            for key, result in zip(keys, results[::step])
+        }
+
+    async def set_flag(self, key: str, ttl_seconds: int) -> bool:
+        """Plain SET EX on Redis itself, for short-lived markers every worker must see.
+
+        Exact TTL (no jitter), no L1 and no invalidation broadcast. False when
+        Redis is unavailable; the in-process backend is never used.
+        """
+        client = await self._get_redis()
+        if not client:
+            return False
+        try:
+            await client.set(key, b"1", ex=ttl_seconds)
+            return True
+        except Exception as e:  # pragma: no cover
+            logger.debug(f"Redis set failed for {key}: {e}")
+            self._record_failure(e)
+            return False
+
+    async def has_flag(self, key: str) -> Optional[bool]:
+        """Whether a set_flag marker exists, or None when Redis can't answer."""
+        client = await self._get_redis()
+        if not client:
+            return None
+        try:
+            return bool(await client.exists(key))
+        except Exception as e:  # pragma: no cover
+            logger.debug(f"Redis exists failed for {key}: {e}")
+            self._record_failure(e)
+            return None
+
+    async def publish_invalidation(self, *keys: str) -> None:
+        """Tell the other workers to drop these keys from their L1."""
+        if not settings.cache_l1_enabled:
+            return
+        client = await self.get_client()
+        if not client:
+            return
+        message = json.dumps({"origin": self._instance_id, "keys": list(keys)})
+        try:
+            await client.publish(settings.cache_invalidation_channel, message)
+        except Exception as e:  # pragma: no cover
+            logger.debug(f"Redis publish failed for {keys}: {e}")
+            self._record_failure(e)
+
+    def apply_invalidation(self, data: bytes) -> None:
+        try:
+            message = json.loads(data)
+        except ValueError:  # pragma: no cover
+            return
+        if message.get("origin") == self._instance_id:
+            return
+        for key in message.get("keys", []):
+            self.l1.delete(key)
+
+    async def invalidation_listener(self, retry_seconds: float = 5.0) -> None:
+        """Subscribe to the invalidation channel for the life of the worker.
+
+        L1 is enabled only while subscribed and cleared on every (re)subscribe,
+        since messages published while disconnected are lost.
+        """
+        if not settings.cache_l1_enabled or not self._redis_configured():
+            return  # The in-process backend needs no L1 in front of it
+        while True:
+            client = await self._get_redis()
+            if not client:
+                await asyncio.sleep(retry_seconds)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.cache_invalidation_channel)
+                self.l1.clear()
+                self._l1_live = True
+                while True:
+                    # Bounded wait so the pooled socket_timeout doesn't fire on a quiet channel
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self.apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation subscription lost: {e}")
+                self._record_failure(e)
+            finally:
+                self._l1_live = False
+                self.l1.clear()
+                try:
+                    await pubsub.aclose()
+                except Exception:  # pragma: no cover
+                    pass
+            await asyncio.sleep(retry_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-namespace lookups and hit ratio of each tier (L2 ratio is over L1 misses)."""
+        namespaces: Dict[str, Dict[str, Any]] = {}
+        for _, (namespace, result), value in cache_requests.samples():
+            namespaces.setdefault(namespace, {"l1_hit": 0, "l2_hit": 0, "miss": 0})[result] = int(value)
+        for namespace, counts in namespaces.items():
+            total = counts["l1_hit"] + counts["l2_hit"] + counts["miss"]
+            remote = counts["l2_hit"] + counts["miss"]
+            counts["l1_hit_ratio"] = round(counts["l1_hit"] / total, 4) if total else None
+            counts["l2_hit_ratio"] = round(counts["l2_hit"] / remote, 4) if remote else None
+        for _, (namespace,), value in cache_negative_hits.samples():
+            namespaces.setdefault(namespace, {"l1_hit": 0, "l2_hit": 0, "miss": 0})["negative_hits"] = int(value)
+        return {
+            "l1_active": self.l1_active,
+            "l1_entries": self.l1.sizes(),
+            "namespaces": namespaces,
+        }
+
+    async def read_versions(self, *namespaces: str) -> Optional[List[int]]:
+        """Generation counters in one MGET, or None when Redis can't answer.
+
+        Callers that must not trust a default (e.g. ETags) use this directly.
+        The in-process backend's counters don't see other workers' bumps, so
+        they never answer here.
+        """
+        return await self._read_versions(await self._get_redis(), namespaces)
+
+    async def _read_versions(self, client: Optional[Any], namespaces) -> Optional[List[int]]:
+        if not client or not namespaces:
+            return None
+        try:
+            raw = await client.mget([f"{namespace}:ver" for namespace in namespaces])
+            return [int(value) if value is not None else 0 for value in raw]
+        except Exception as e:  # pragma: no cover
+            logger.debug(f"Redis version lookup failed for {namespaces}: {e}")
+            self._record_failure(e)
+            return None
+
+    async def get_versions(self, *namespaces: str) -> List[int]:
+        """Current generation counter of each namespace (0 if never bumped or unavailable).
+
+        Used for cache keys, so the in-process backend's counters are fine here.
+        """
+        versions = await self._read_versions(await self.get_client(), namespaces)
+        return versions if versions is not None else [0] * len(namespaces)
+
+    async def bump_version(self, namespace: str) -> Optional[int]:
+        """Atomically move a namespace to a new generation.
+
+        Entries are keyed `<namespace>:v<n>`, so after an INCR readers build a
+        different key and old entries simply age out. O(1), no deletes, and no
+        window where a racing reader can repopulate the old generation.
+        """
+        (version,) = await self.bump_versions(namespace)
+        return version
+
+    async def bump_versions(self, *namespaces: str) -> List[Optional[int]]:
+        """bump_version for several namespaces in one round trip."""
+        keys = [f"{namespace}:ver" for namespace in namespaces]
+        versions = await self.incr_many(keys, ttl_seconds=VERSION_TTL_SECONDS)
+        return [versions.get(key) for key in keys]
+
+    async def pfadd(self, key: str, *values: str, ttl_seconds: Optional[int] = None) -> None:
+        """Add members to a HyperLogLog (approximate distinct count, ~12KB per key)."""
+        await self.pfadd_many({key: values}, ttl_seconds=ttl_seconds)
+
+    async def pfadd_many(self, members: Dict[str, Iterable[str]], ttl_seconds: Optional[int] = None) -> None:
+        """PFADD (and EXPIRE) into several HyperLogLogs in one round trip. Best-effort."""
+        members = {key: list(values) for key, values in members.items() if values}
+        if not members:
+            return
+
+        def queue(pipe):
+            for key, values in members.items():
+                pipe.pfadd(key, *values)
+                if ttl_seconds:
+                    pipe.expire(key, ttl_seconds)
+
+        await self._pipeline(queue)
+
+    async def pfcount(self, *keys: str) -> Optional[int]:
+        """Cardinality of the union of one or more HyperLogLogs."""
+        client = await self.get_client()
+        if not client or not keys:
+            return None
+        try:
+            return await client.pfcount(*keys)
+        except Exception as e:  # pragma: no cover
+            logger.debug(f"Redis pfcount failed for {keys}: {e}")
+            self._record_failure(e)
+            return None
+
+    async def pfcount_many(self, keys: List[str]) -> Dict[str, Optional[int]]:
+        """Separate cardinality of each HyperLogLog in one round trip; None where unavailable."""
+        if not keys:
+            return {}
+        results = await self._pipeline(lambda pipe: [pipe.pfcount(key) for key in keys])
+        if results is None:
+            return {key: None for key in keys}
+        return {key: None if isinstance(result, Exception) else result for key, result in zip(keys, results)}
+
+    async def pfmerge(self, dest: str, *sources: str, ttl_seconds: Optional[int] = None) -> bool:
+        client = await self.get_client()
+        if not client or not sources:
+            return False
+        try:
+            await client.pfmerge(dest, *sources)
+            if ttl_seconds:
+                await client.expire(dest, ttl_seconds)
+            return True
+        except Exception as e:  # pragma: no cover
+            logger.debug(f"Redis pfmerge failed for {dest}: {e}")
+            self._record_failure(e)
+            return False
+
+    def _refresh_early(self, entry: Dict[str, Any], now: float) -> bool:
+        """Probabilistic early expiration ("XFetch"): refresh ahead of expiry with a
+        probability that rises as expiry nears and with how long the value took to load."""
+        beta = settings.cache_early_expiration_beta
+        if beta <= 0:
+            return False
+        gap = -entry.get("delta", 0) * beta * math.log(random.random() or 1e-12)
+        return now + gap >= entry["expires_at"]
+
+    async def _wait_for_peer(self, key: str) -> Any:
+        """Another worker holds the loader lock: poll Redis briefly for its value."""
+        deadline = time.monotonic() + settings.cache_lock_wait_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+            entry = await self._get_remote(key)
+            if is_envelope(entry) and entry["expires_at"] > time.time():
+                return entry["value"]
+        return LRUCache.MISSING
+
+    async def store_cached(self, key: str, value: Any, ttl_seconds: int, stale_ttl_seconds: int = 0,
+                           negative_ttl_seconds: Optional[int] = None, delta: float = 0.0,
+                           publish: bool = False) -> None:
+        """Write a value the way cached() does (envelope with logical expiry).
+
+        None is stored as an explicit negative entry for negative_ttl_seconds
+        (default cache_negative_ttl_seconds; 0 skips storing it), so write-through
+        callers can record "not found" as well. Callers overwriting a key other
+        workers may hold pass publish=True so they drop their L1 copy; fills and
+        writes to a fresh generation key don't need to.
+        """
+        negative = value is None
+        if negative:
+            if negative_ttl_seconds is None:
+                negative_ttl_seconds = settings.cache_negative_ttl_seconds
+            if negative_ttl_seconds <= 0:
+                return
+            ttl_seconds = negative_ttl_seconds
+        ttl = jittered_ttl(ttl_seconds)
+        entry = {ENVELOPE_MARKER: 1, "value": value, "expires_at": time.time() + ttl, "delta": delta}
+        if negative:
+            entry["negative"] = 1
+        await self._store(key, entry, ttl + stale_ttl_seconds, publish)
+
+    async def _acquire_lock(self, client: Any, lock_key: str, token: str) -> bool:
+        if isinstance(client, MemoryRedis):
+            return await client.acquire_lock(lock_key, token, settings.cache_lock_timeout_ms)
+        return bool(await client.set(lock_key, token, nx=True, px=settings.cache_lock_timeout_ms))
+
+    async def _release_lock(self, client: Any, lock_key: str, token: str) -> None:
+        if isinstance(client, MemoryRedis):
+            await client.release_lock(lock_key, token)
+        else:
+            await client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+    async def _load_and_store(self, key: str, ttl_seconds: int, loader: Callable[[], Awaitable[Any]],
+                              stale_ttl_seconds: int, negative_ttl_seconds: Optional[int]) -> Any:
+        client = await self.get_client()
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        locked = False
+        if client:
+            try:
+                locked = await self._acquire_lock(client, lock_key, token)
+            except Exception as e:  # pragma: no cover
+                logger.debug(f"Redis lock failed for {key}: {e}")
+                self._record_failure(e)
+            if not locked:
+                value = await self._wait_for_peer(key)
+                if value is not LRUCache.MISSING:
+                    return value
+                # Lock holder is slow or gone; load rather than fail the request
+        try:
+            cache_loader_calls.inc(namespace=self.l1.namespace_of(key))
+            started = time.perf_counter()
+            value = await loader()
+            delta = time.perf_counter() - started
+            await self.store_cached(key, value, ttl_seconds, stale_ttl_seconds, negative_ttl_seconds, delta)
+            return value
+        finally:
+            if locked:
+                try:
+                    await self._release_lock(client, lock_key, token)
+                except Exception as e:  # pragma: no cover
+                    logger.debug(f"Redis lock release failed for {key}: {e}")
+                    self._record_failure(e)
+
+    def _load_once(self, key: str, ttl_seconds: int, loader: Callable[[], Awaitable[Any]],
+                   stale_ttl_seconds: int, negative_ttl_seconds: Optional[int]) -> "asyncio.Future":
+        """Singleflight: concurrent callers for one key share a single load task."""
+        task = self._inflight.get(key)
+        if task is None:
+            # Shared by all callers, so its SQL belongs to none of their requests
+            task = asyncio.ensure_future(without_query_stats(self._load_and_store)(
+                key, ttl_seconds, loader, stale_ttl_seconds, negative_ttl_seconds
+            ))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_load(key, done))
+        return task
+
+    def _finish_load(self, key: str, task: "asyncio.Future") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Cache loader failed for {key}: {task.exception()}")
+
+    async def cached(self, key: str, ttl_seconds: int, loader: Callable[[], Awaitable[Any]],
+                     stale_ttl_seconds: int = 0, negative_ttl_seconds: Optional[int] = None):
+        """Read-through cache returning (value, was_cached), safe against stampedes.
+
+        - Concurrent misses in this process share one loader call (singleflight);
+          across workers a short Redis lock lets one load while the rest wait for it.
+        - Values are refreshed slightly before expiry with rising probability, and
+          TTLs are jittered, so hot keys rarely expire under load at all.
+        - With stale_ttl_seconds > 0, an expired value is still served for that long
+          while one background task refreshes it.
+
+        The loader is shared by every concurrent caller and shielded from their
+        cancellation, so it must not use a request's DB session: open one inside
+        it (database.detached_session).
+
+        A None result is cached as an explicit negative entry for
+        negative_ttl_seconds (default cache_negative_ttl_seconds, 0 disables), so
+        "not found" lookups don't reach the database on every call either.
+        """
+        entry = await self._get_entry(key)
+        if entry is not None and not is_envelope(entry):
+            return entry, True  # Plain value written by set_json
+        if entry is not None:
+            now = time.time()
+            expired = now >= entry["expires_at"]
+            if not expired and not self._refresh_early(entry, now):
+                if is_negative(entry):
+                    cache_negative_hits.inc(namespace=self.l1.namespace_of(key))
+                return entry["value"], True
+            if stale_ttl_seconds > 0:
+                self._load_once(key, ttl_seconds, loader, stale_ttl_seconds, negative_ttl_seconds)
+                if expired:
+                    cache_stale_served.inc(namespace=self.l1.namespace_of(key))
+                return entry["value"], True
+        # Shielded so a cancelled request doesn't cancel the load other callers share
+        value = await asyncio.shield(
+            self._load_once(key, ttl_seconds, loader, stale_ttl_seconds, negative_ttl_seconds)
+        )
+        return value, False
 
 redis_cache = RedisCache()
+
+gauge(
+    "redis_up", "1 while Redis is reachable and the circuit breaker is closed",
+    callback=lambda: {(): 1.0 if redis_cache.status()["state"] == "up" else 0.0}
+)
+
+gauge(
+    "cache_l1_entries", "Entries held in the in-process L1 cache", ["namespace"],
+    callback=lambda: {(namespace,): size for namespace, size in redis_cache.l1.sizes().items()}
+)
@@ -0,0 +1,142 @@
+import json
+import logging
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Optional accelerators; the stdlib fallbacks are always available
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Every value stored by the cache starts with one header byte:
+#   (serializer id << 2) | compression id
+# All headers are below 0x20, so values written before codecs existed (plain
+# JSON text, which always starts with a printable character) still decode.
+SERIALIZER_IDS = {"json": 1, "orjson": 2, "msgpack": 3}
+COMPRESSION_IDS = {"none": 0, "zlib": 1, "zstd": 2}
+LEGACY_JSON_MIN_BYTE = 0x20
+
+
+class CodecError(ValueError):
+    """A cached value could not be decoded."""
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _serializers() -> Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    serializers = {"json": (_json_dumps, json.loads)}
+    if orjson:
+        serializers["orjson"] = (orjson.dumps, orjson.loads)
+    if msgpack:
+        serializers["msgpack"] = (
+            lambda value: msgpack.packb(value, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False),
+        )
+    return serializers
+
+
+def _compressors() -> Dict[str, Tuple[Callable[[bytes, int], bytes], Callable[[bytes], bytes]]]:
+    compressors = {"zlib": (lambda data, level: zlib.compress(data, level), zlib.decompress)}
+    if zstandard:
+        compressors["zstd"] = (
+            lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+            lambda data: zstandard.ZstdDecompressor().decompress(data),
+        )
+    return compressors
+
+
+SERIALIZERS = _serializers()
+COMPRESSORS = _compressors()
+SERIALIZERS_BY_ID = {SERIALIZER_IDS[name]: codec for name, codec in SERIALIZERS.items()}
+COMPRESSORS_BY_ID = {COMPRESSION_IDS[name]: codec for name, codec in COMPRESSORS.items()}
+
+DEFAULT_LEVELS = {"zlib": 6, "zstd": 3}
+
+
+class Codec:
+    """Encodes cache values to bytes and decodes anything any codec wrote.
+
+    Decoding is driven by the header byte, not by this codec's configuration,
+    so workers with different settings (e.g. during a rollout) can share keys.
+    """
+
+    def __init__(self, serializer: str = "json", compression: str = "none",
+                 compress_min_bytes: int = 1024, level: Optional[int] = None):
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Cache serializer '{serializer}' is not available")
+        if compression != "none" and compression not in COMPRESSORS:
+            raise ValueError(f"Cache compression '{compression}' is not available")
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self.level = level if level is not None else DEFAULT_LEVELS.get(compression, 0)
+        self._dumps = SERIALIZERS[serializer][0]
+
+    @property
+    def name(self) -> str:
+        return self.serializer if self.compression == "none" else f"{self.serializer}+{self.compression}"
+
+    def encode(self, value: Any) -> bytes:
+        payload = self._dumps(value)
+        compression = "none"
+        if self.compression != "none" and len(payload) >= self.compress_min_bytes:
+            compressed = COMPRESSORS[self.compression][0](payload, self.level)
+            if len(compressed) < len(payload):
+                payload, compression = compressed, self.compression
+        header = (SERIALIZER_IDS[self.serializer] << 2) | COMPRESSION_IDS[compression]
+        return bytes([header]) + payload
+
+    @staticmethod
+    def decode(data: bytes) -> Any:
+        if not data:
+            raise CodecError("Empty cache value")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        header = data[0]
+        try:
+            if header >= LEGACY_JSON_MIN_BYTE:
+                return json.loads(data)
+            serializer = SERIALIZERS_BY_ID.get(header >> 2)
+            compression_id = header & 0b11
+            if serializer is None:
+                raise CodecError(f"Unknown serializer in cache header {header:#04x}")
+            payload = data[1:]
+            if compression_id:
+                compressor = COMPRESSORS_BY_ID.get(compression_id)
+                if compressor is None:
+                    raise CodecError(f"Unknown compression in cache header {header:#04x}")
+                payload = compressor[1](payload)
+            return serializer[1](payload)
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(str(e)) from e
+
+
+def codec_from_settings(serializer: str, compression: str, compress_min_bytes: int,
+                        level: Optional[int] = None) -> Codec:
+    """Build the configured codec; "auto" picks orjson when installed, else stdlib json."""
+    if serializer == "auto":
+        serializer = "orjson" if "orjson" in SERIALIZERS else "json"
+    if serializer not in SERIALIZERS:
+        logger.warning(f"Cache serializer '{serializer}' is not installed, using json")
+        serializer = "json"
+    if compression != "none" and compression not in COMPRESSORS:
+        logger.warning(f"Cache compression '{compression}' is not installed, using zlib")
+        compression = "zlib"
+    return Codec(serializer, compression, compress_min_bytes, level)
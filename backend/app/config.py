@@ -15,17 +15,103 @@ class Settings(BaseSettings):
     database_name: str = "humanreplies"
     database_user: str = "postgres"
     database_password: str = "password"
+    database_pool_size: int = 10  # Connections kept open per worker
+    database_max_overflow: int = 10  # Extra connections opened under load, closed when returned
+    database_pool_timeout_seconds: float = 10.0  # Wait for a free connection before failing
+    database_pool_recycle_seconds: int = 1800  # Replace connections older than this (-1 never)
+    database_pool_pre_ping: bool = True  # Test connections on checkout, dropping dead ones
+    database_pgbouncer: bool = False  # Behind a transaction-pooling PgBouncer: no cached prepared statements
+    database_replica_url: Optional[str] = None  # Read replica for read-only endpoints (same pool settings)
+    database_replica_max_lag_seconds: float = 5.0  # Reads go to the primary while lag exceeds this
+    database_replica_health_interval_seconds: float = 5.0
+    database_replica_pin_seconds: int = 15  # Primary-only reads for a user after their own write
+    database_statement_timeout_ms: int = 30000  # Per-request default, SET LOCAL (app/query_timeouts.py); 0 disables
+    database_lock_timeout_ms: int = 5000  # 0 disables
+    database_timeout_retry_after_seconds: int = 5  # Retry-After on 503s from query timeouts
+    database_cancel_on_disconnect: bool = True  # Cancel GET/HEAD handlers (and their queries) when the client leaves
+    sql_instrumentation_enabled: bool = True  # Per-request SQL stats (app/query_stats.py)
+    sql_query_budget: int = 15  # Warn when a request runs more statements; 0 disables
+    sql_repeated_statement_threshold: int = 5  # Warn when one statement shape repeats this often (N+1); 0 disables
+    slow_query_threshold_ms: int = 500  # Log statements slower than this (app/slow_queries.py); 0 disables
+    slow_query_log_file: str = "logs/slow_queries.log"
+    slow_query_log_max_bytes: int = 10 * 1024 * 1024
+    slow_query_log_backup_count: int = 5
+    slow_query_explain_sample_rate: float = 0.0  # Share of slow SELECTs re-run with EXPLAIN ANALYZE; 0 disables
+    slow_query_explain_timeout_ms: int = 10000
     
     # API Settings
     environment: str = "development"
     api_host: str = "0.0.0.0"
     api_port: int = 8000
+    metrics_token: Optional[str] = None  # Bearer token required for /metrics; unset = open (internal-only deployments)
     
     # Redis Cache
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_db: int = 0
     redis_enabled: bool = True
+    redis_max_connections: int = 50
+    redis_pool_timeout_seconds: float = 1.0  # Wait for a free pooled connection
+    redis_socket_timeout_seconds: float = 0.5
+    redis_socket_connect_timeout_seconds: float = 0.5
+    redis_health_check_interval_seconds: int = 30
+    # Circuit breaker: this many connection errors within the window marks Redis down
+    redis_failure_threshold: int = 3
+    redis_failure_window_seconds: float = 10.0
+    redis_retry_backoff_seconds: float = 1.0  # First background retry; doubles per failure
+    redis_retry_backoff_max_seconds: float = 30.0
+    
+    # auto: Redis, with an in-process cache when Redis is disabled or unreachable;
+    # redis: Redis only; memory: in-process only (per worker)
+    cache_backend: str = "auto"
+    memory_cache_max_bytes: int = 64 * 1024 * 1024  # Per worker
+    memory_cache_max_ttl_seconds: int = 300  # Not shared across workers, so keep it short
+    
+    # In-process L1 in front of Redis (per worker), kept coherent over pub/sub
+    cache_l1_enabled: bool = True
+    cache_l1_ttl_seconds: int = 30
+    cache_l1_max_entries: int = 2000  # Keys outside the namespaces below
+    cache_l1_namespace_sizes: str = "tones:presets=8,tones:user=5000,total_replies_count=1"  # prefix=entries[/ttl]
+    cache_invalidation_channel: str = "cache:invalidate"
+    
+    # Cached value encoding (see app/cache_codecs.py)
+    cache_serializer: str = "auto"  # auto (orjson if installed), json, orjson, msgpack
+    cache_compression: str = "zlib"  # none, zlib, zstd
+    cache_compress_min_bytes: int = 1024  # Smaller values are stored uncompressed
+    cache_compression_level: Optional[int] = None  # Codec default when unset
+    
+    # Stampede protection for RedisCache.cached
+    cache_ttl_jitter: float = 0.1  # TTLs are spread by +/- this fraction
+    cache_early_expiration_beta: float = 1.0  # Probabilistic early refresh; 0 disables
+    cache_lock_timeout_ms: int = 5000  # Cross-worker loader lock
+    cache_lock_wait_seconds: float = 2.0  # How long lock losers wait for the winner's value
+    cache_negative_ttl_seconds: int = 60  # Cached "not found" results; 0 disables
+    route_cache_enabled: bool = True  # @cache_route responses (app/route_cache.py)
+    route_cache_encodings: str = "br,gzip"  # Pre-compressed variants stored with cached responses
+    route_cache_compress_min_bytes: int = 512
+    
+    # Per-user settings + rendered prompt fragments (in-process LRU in front of Redis)
+    user_settings_cache_ttl_seconds: int = 3600
+    user_settings_l1_ttl_seconds: int = 30
+    user_settings_l1_max_entries: int = 10000
+    
+    # Replies partitioning (monthly RANGE partitions on created_at)
+    replies_partition_months_ahead: int = 3
+    replies_retention_months: int = 0  # 0 keeps every partition
+    replies_retention_action: str = "detach"  # "detach" or "drop"
+    partition_maintenance_interval_seconds: int = 21600
+    
+    # Batch reply ingestion (POST /replies/batch)
+    replies_batch_max_events: int = 500
+    replies_batch_max_event_age_days: int = 7  # Older client timestamps are clamped
+    replies_batch_max_clock_skew_seconds: int = 300
+    replies_idempotency_window_days: int = 14  # How long event ids are remembered
+    reply_rollup_compact_interval_seconds: int = 60  # Folding reply_rollup_deltas into daily rollups
+    
+    # Bulk analytics purges (chunked background deletes)
+    purge_chunk_size: int = 1000
+    purge_throttle_seconds: float = 0.05  # Pause between chunks
+    purge_job_ttl_seconds: int = 86400  # How long job progress stays queryable
     
     class Config:
         env_file = ".env"
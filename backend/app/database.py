@@ -1,16 +1,119 @@
+import inspect
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
+from app.metrics import counter, gauge, histogram
+from app.query_stats import instrument_engine
+from app.query_timeouts import guard_engine
 
 # SQLAlchemy setup for local PostgreSQL
 class Base(DeclarativeBase):
     pass
 
+pool_checkout_wait = histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent getting a pooled connection (includes connecting when the pool grows)",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+pool_checkout_timeouts = counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up after DATABASE_POOL_TIMEOUT_SECONDS"
+)
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_checkout_timeouts.inc()
+            raise
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - started)
+
+def engine_options() -> Dict[str, Any]:
+    options: Dict[str, Any] = dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow,
+        pool_timeout=settings.database_pool_timeout_seconds,
+        pool_recycle=settings.database_pool_recycle_seconds,
+        pool_pre_ping=settings.database_pool_pre_ping,
+    )
+    if settings.database_pgbouncer:
+        # Transaction pooling may run each transaction on a different server
+        # connection, so asyncpg must not reuse prepared statements by name:
+        # disable both statement caches and give every statement a unique name
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return options
+
 # Create async engine
 engine = create_async_engine(
     settings.database_url,
     echo=settings.environment == "development",
-    future=True
+    future=True,
+    **engine_options()
+)
+
+# Optional read replica for read-only endpoints (see app/replica.py)
+replica_engine = create_async_engine(
+    settings.database_replica_url,
+    echo=settings.environment == "development",
+    future=True,
+    **engine_options()
+) if settings.database_replica_url else None
+
+# Statement/lock timeouts become 503s (see app/query_timeouts.py)
+guard_engine(engine)
+if replica_engine is not None:
+    guard_engine(replica_engine)
+
+if settings.sql_instrumentation_enabled:
+    instrument_engine(engine)
+    if replica_engine is not None:
+        instrument_engine(replica_engine)
+
+def pool_status(pool_engine=None) -> Dict[str, float]:
+    """Connection pool usage; saturation is checked-out / (pool_size + max_overflow)."""
+    pool = (pool_engine or engine).pool
+    capacity = pool.size() + max(settings.database_max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "size": pool.size(),
+        "checked_out": checked_out,
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+    }
+
+def pool_engines() -> Dict[str, Any]:
+    engines = {"primary": engine}
+    if replica_engine is not None:
+        engines["replica"] = replica_engine
+    return engines
+
+gauge(
+    "db_pool_connections", "Pooled database connections by state", ["database", "state"],
+    callback=lambda: {
+        (name, state): pool_status(pool_engine)[state]
+        for name, pool_engine in pool_engines().items()
+        for state in ("checked_out", "idle", "overflow")
+    }
+)
+gauge(
+    "db_pool_saturation", "Checked-out connections as a fraction of pool_size + max_overflow", ["database"],
+    callback=lambda: {(name,): pool_status(pool_engine)["saturation"] for name, pool_engine in pool_engines().items()}
 )
 
 # Create session factory
@@ -20,13 +123,103 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
-# Dependency to get database session
+ReplicaSessionLocal = async_sessionmaker(
+    replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+) if replica_engine is not None else None
+
+session_requests = counter(
+    "db_session_requests_total",
+    "Requests that declared a database session, by whether they ended up using it", ["used"]
+)
+
+class LazySession:
+    """AsyncSession stand-in for request dependencies; the real session is created on first use.
+
+    `factory` is a session factory, or an async callable returning one (so
+    read routing is only decided when a handler actually needs data). A sync
+    method such as `add()` used before anything else opens `fallback`.
+    Requests served from cache, or rejected before the handler, never
+    create a session.
+
+    Only the methods below are proxied; anything else raises AttributeError
+    rather than quietly checking out a connection. Code needing more of the
+    AsyncSession API opens its own session.
+    """
+
+    ASYNC_METHODS = {
+        "execute", "scalar", "scalars", "stream", "get", "refresh", "delete", "flush", "commit", "rollback"
+    }
+    SYNC_METHODS = {"add", "add_all"}
+    # Nothing to do on a session that was never opened
+    UNOPENED_NOOPS = {"commit", "rollback", "flush"}
+
+    def __init__(self, factory: Callable, fallback: Optional[async_sessionmaker] = None):
+        self._factory = factory
+        self._fallback = fallback or factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def used(self) -> bool:
+        return self._session is not None
+
+    async def _open(self) -> AsyncSession:
+        if self._session is None:
+            factory = self._factory
+            if inspect.iscoroutinefunction(factory):
+                factory = await factory()
+            if self._session is None:
+                self._session = factory()
+        return self._session
+
+    def __getattr__(self, name: str):
+        if name in self.ASYNC_METHODS:
+            async def call(*args, **kwargs):
+                if self._session is None and name in self.UNOPENED_NOOPS:
+                    return None
+                return await getattr(await self._open(), name)(*args, **kwargs)
+            return call
+        if name in self.SYNC_METHODS:
+            if self._session is None:
+                self._session = self._fallback()
+            return getattr(self._session, name)
+        raise AttributeError(f"LazySession does not proxy {name!r}")
+
+    def fork(self) -> "LazySession":
+        """A new, unopened session that routes the same way."""
+        return LazySession(self._factory, self._fallback)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+@asynccontextmanager
+async def lazy_session_scope(session: LazySession):
+    """Hand a LazySession to a request, then count and close it."""
+    try:
+        yield session
+    finally:
+        session_requests.inc(used="true" if session.used else "false")
+        await session.close()
+
+@asynccontextmanager
+async def detached_session(session: Any = None):
+    """Own session for a cache loader, routed like the request's `session`.
+
+    RedisCache.cached() shares one shielded load between concurrent requests,
+    so a loader must not run on whichever request's session happened to start it.
+    """
+    fork = session.fork() if isinstance(session, LazySession) else LazySession(AsyncSessionLocal)
+    try:
+        yield fork
+    finally:
+        await fork.close()
+
+# Dependency to get database session (opened on first use)
 async def get_db():
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+    async with lazy_session_scope(LazySession(AsyncSessionLocal)) as session:
+        yield session
 
 # Supabase clients (Auth only) - Initialize lazily to avoid import issues
 supabase = None
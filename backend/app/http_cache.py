@@ -0,0 +1,79 @@
+import hashlib
+import logging
+import time
+from typing import Iterable, List, Optional
+
+from fastapi import Request, Response
+
+from app.cache import redis_cache
+
+logger = logging.getLogger(__name__)
+
+# Per-user data-version namespaces, bumped by the write paths that change them.
+# Tone namespaces live in routers/tones.py and share the same counters.
+PROFILE_NAMESPACE = "users:profile"
+USER_SETTINGS_NAMESPACE = "user_settings"
+REPLY_STATS_NAMESPACE = "replies:user"
+SERVICE_URLS_NAMESPACE = "services:urls"
+
+# ETags also rotate on this interval, bounding staleness if a version bump is ever lost
+ETAG_ROTATION_SECONDS = 300
+
+PRIVATE_REVALIDATE = "private, no-cache"
+PUBLIC_SHORT = "public, max-age=60"
+
+
+def user_namespace(resource: str, user_supabase_id: str) -> str:
+    return f"{resource}:{user_supabase_id}"
+
+
+async def bump_user_data_version(resource: str, user_supabase_id: str) -> None:
+    """Record a write so conditional GETs for this user's resource stop matching."""
+    try:
+        await redis_cache.bump_version(user_namespace(resource, user_supabase_id))
+    except Exception as e:  # pragma: no cover
+        logger.debug(f"Failed to bump {resource} version: {e}")
+
+
+async def data_etag(namespaces: List[str], extra: Iterable[str] = ()) -> Optional[str]:
+    """Weak ETag from version counters (one MGET, no database), or None if Redis is unavailable."""
+    versions = await redis_cache.read_versions(*namespaces)
+    if versions is None:
+        return None
+    return etag_from_versions(namespaces, versions, extra)
+
+
+def etag_from_versions(namespaces: List[str], versions: List[int], extra: Iterable[str] = ()) -> str:
+    parts = [f"{namespace}={version}" for namespace, version in zip(namespaces, versions)]
+    parts.append(str(int(time.time() // ETAG_ROTATION_SECONDS)))
+    parts.extend(extra)
+    digest = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Weak comparison against If-None-Match (RFC 9110 13.1.2)."""
+    if not etag:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == wanted for candidate in header.split(","))
+
+
+def not_modified(etag: str, cache_control: str, vary: Optional[str] = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if vary:
+        headers["Vary"] = vary
+    return Response(status_code=304, headers=headers)
+
+
+def set_cache_headers(response: Response, etag: Optional[str], cache_control: str, vary: Optional[str] = None) -> None:
+    if etag:
+        response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if vary:
+        response.headers["Vary"] = vary
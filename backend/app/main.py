@@ -1,11 +1,21 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
-from app.routers import auth, users, replies, services, tones, user_settings
+from app.routers import auth, users, replies, services, tones, user_settings, analytics
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine, replica_engine, Base, pool_status
+from app.replica import RecentWriteMiddleware, replica_health, replica_health_loop
+from app.query_stats import QueryStatsMiddleware
+from app.query_timeouts import QueryGuardMiddleware, database_timeout
+from app.partitions import run_partition_maintenance, partition_maintenance_loop
+from app.rollups import rollup_compaction_loop
+from app.cache import redis_cache
+from app.slow_queries import close_slow_log
+from app.metrics import registry
+import asyncio
+import secrets
 import uvicorn
 import logging
 from app.config import settings
@@ -29,9 +39,26 @@ async def lifespan(app: FastAPI):
     # Create tables on startup
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # Make sure the current and upcoming reply partitions exist before accepting writes
+    try:
+        await run_partition_maintenance()
+    except Exception as e:
+        logger.error(f"Initial reply partition maintenance failed: {e}")
+    partition_task = asyncio.create_task(partition_maintenance_loop())
+    # Keeps this worker's L1 cache coherent with writes made by other workers
+    invalidation_task = asyncio.create_task(redis_cache.invalidation_listener())
+    replica_task = asyncio.create_task(replica_health_loop())
+    rollup_task = asyncio.create_task(rollup_compaction_loop())
     yield
     # Cleanup on shutdown
+    partition_task.cancel()
+    invalidation_task.cancel()
+    replica_task.cancel()
+    rollup_task.cancel()
     await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+    close_slow_log()
 
 # Create FastAPI app
 app = FastAPI(
@@ -54,6 +81,15 @@ app.add_middleware(
     max_age=3600,
 )
 
+if replica_engine is not None:
+    app.add_middleware(RecentWriteMiddleware)
+
+if settings.sql_instrumentation_enabled:
+    app.add_middleware(QueryStatsMiddleware)
+
+# Outermost, so the request timeouts and disconnect cancellation cover everything
+app.add_middleware(QueryGuardMiddleware)
+
 # Add explicit OPTIONS handlers for common API paths
 @app.options("/api/v1/services/generate-reply")
 async def options_generate_reply():
@@ -71,13 +107,16 @@ async def options_generate_reply():
 # Global exception handler
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
+    # Query timeouts wrapped by a handler's catch-all still answer 503 + Retry-After
+    exc = database_timeout(exc) or exc
     return JSONResponse(
         status_code=exc.status_code,
         content={
             "success": False,
             "error": exc.detail,
             "status_code": exc.status_code
-        }
+        },
+        headers=exc.headers
     )
 
 # Health check endpoint
@@ -87,9 +126,25 @@ async def health_check():
         "status": "healthy",
         "environment": settings.environment,
         "message": "HumanReplies backend is running",
-        "database": "PostgreSQL + Supabase Auth"
+        "database": "PostgreSQL + Supabase Auth",
+        "database_pool": pool_status(),
+        "database_replica": {**replica_health.status(), **(
+            {"pool": pool_status(replica_engine)} if replica_engine is not None else {}
+        )},
+        "redis": redis_cache.status(),
+        "cache": redis_cache.stats()
     }
 
+# Prometheus metrics (per worker process). Route names, pool sizes and cache
+# behaviour are not for the public: set METRICS_TOKEN or keep this internal-only
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request):
+    if settings.metrics_token:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not secrets.compare_digest(token, settings.metrics_token):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(users.router, prefix="/api/v1")
@@ -97,6 +152,7 @@ app.include_router(replies.router, prefix="/api/v1")
 app.include_router(services.router, prefix="/api/v1")
 app.include_router(tones.router, prefix="/api/v1")
 app.include_router(user_settings.router, prefix="/api/v1")
+app.include_router(analytics.router, prefix="/api/v1")
 
 # Root endpoint
 @app.get("/")
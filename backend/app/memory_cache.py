@@ -0,0 +1,212 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Per-key bookkeeping overhead counted against max_bytes
+ENTRY_OVERHEAD_BYTES = 64
+
+
+class MemoryPipeline:
+    """Queues commands like a redis pipeline and runs them in order on execute()."""
+
+    def __init__(self, client: "MemoryRedis"):
+        self._client = client
+        self._commands: List[Tuple[Any, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        command = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        commands, self._commands = self._commands, []
+        results = []
+        for command, args, kwargs in commands:
+            try:
+                results.append(await command(*args, **kwargs))
+            except Exception as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        return results
+
+
+class MemoryRedis:
+    """In-process stand-in for the subset of `redis.asyncio.Redis` that RedisCache uses.
+
+    Strings are stored as bytes like Redis does; HyperLogLogs are plain sets
+    (exact counts). Entries expire lazily, and least-recently-used keys are
+    evicted once max_bytes is exceeded. No command awaits internally, so each
+    one is atomic on the event loop and safe to share across coroutines.
+
+    Data lives in this worker only: other workers neither see these writes
+    nor get invalidations, so SET TTLs are capped at max_ttl_seconds.
+    """
+
+    def __init__(self, max_bytes: int, max_ttl_seconds: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_ttl_seconds = max_ttl_seconds
+        self._data: "OrderedDict[str, list]" = OrderedDict()  # key -> [value, expires_at, size]
+        self._bytes = 0
+        self.evictions = 0
+
+    # Internal helpers
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode("utf-8")
+
+    @staticmethod
+    def _size(key: str, value: Any) -> int:
+        if isinstance(value, set):
+            payload = sum(len(member) for member in value)
+        else:
+            payload = len(value)
+        return len(key) + payload + ENTRY_OVERHEAD_BYTES
+
+    def _expires_at(self, ttl_seconds: Optional[float], capped: bool = False) -> Optional[float]:
+        # Only cached values are capped; counters (generation versions) keep their TTL
+        if capped and self.max_ttl_seconds:
+            ttl_seconds = min(ttl_seconds, self.max_ttl_seconds) if ttl_seconds else self.max_ttl_seconds
+        return time.monotonic() + ttl_seconds if ttl_seconds else None
+
+    def _live(self, key: str) -> Optional[list]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str) -> bool:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[2]
+        return True
+
+    def _put(self, key: str, value: Any, expires_at: Optional[float]) -> None:
+        self._remove(key)
+        size = self._size(key, value)
+        self._data[key] = [value, expires_at, size]
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._data) > 1:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    # Redis commands
+
+    async def ping(self) -> bool:
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._live(key)
+        if entry is None:
+            return None
+        if isinstance(entry[0], set):
+            raise TypeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return entry[0]
+
+    async def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        values = []
+        for key in keys:
+            entry = self._live(key)
+            values.append(entry[0] if entry is not None and not isinstance(entry[0], set) else None)
+        return values
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None, px: Optional[int] = None,
+                  nx: bool = False) -> Optional[bool]:
+        if nx and self._live(key) is not None:
+            return None
+        ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+        self._put(key, self._encode(value), self._expires_at(ttl, capped=True))
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._live(key) is not None and self._remove(key))
+
+    async def incrby(self, key: str, amount: int = 1) -> int:
+        entry = self._live(key)
+        value = int(entry[0]) + amount if entry is not None else amount
+        self._put(key, self._encode(value), entry[1] if entry is not None else self._expires_at(None))
+        return value
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        return await self.incrby(key, amount)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        entry = self._live(key)
+        if entry is None:
+            return False
+        entry[1] = self._expires_at(seconds)
+        return True
+
+    async def pfadd(self, key: str, *values: str) -> int:
+        entry = self._live(key)
+        members = set(entry[0]) if entry is not None else set()
+        before = len(members)
+        members.update(self._encode(value) for value in values)
+        self._put(key, members, entry[1] if entry is not None else self._expires_at(None))
+        return int(len(members) != before)
+
+    async def pfcount(self, *keys: str) -> int:
+        members = set()
+        for key in keys:
+            entry = self._live(key)
+            if entry is not None:
+                members |= entry[0]
+        return len(members)
+
+    async def pfmerge(self, dest: str, *sources: str) -> bool:
+        members = set()
+        for key in (dest, *sources):
+            entry = self._live(key)
+            if entry is not None:
+                members |= entry[0]
+        existing = self._live(dest)
+        self._put(dest, members, existing[1] if existing is not None else self._expires_at(None))
+        return True
+
+    async def publish(self, channel: str, message: Any) -> int:
+        return 0  # No other subscribers share this process's memory
+
+    # No eval(): Lua scripts are Redis-only. Callers use these explicit
+    # equivalents of the cache loader lock's SET NX PX / compare-and-delete.
+
+    async def acquire_lock(self, key: str, token: str, ttl_ms: int) -> bool:
+        return bool(await self.set(key, token, px=ttl_ms, nx=True))
+
+    async def release_lock(self, key: str, token: str) -> bool:
+        """Delete the lock only if `token` still holds it."""
+        entry = self._live(key)
+        if entry is not None and entry[0] == self._encode(token):
+            self._remove(key)
+            return True
+        return False
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    async def flushdb(self) -> bool:
+        self.clear()
+        return True
+
+    def pipeline(self, transaction: bool = False) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
+    async def aclose(self) -> None:
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {"keys": len(self._data), "used_bytes": self._bytes, "max_bytes": self.max_bytes,
+                "evictions": self.evictions}
@@ -0,0 +1,162 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Minimal in-process metrics in Prometheus text exposition format, served at
+# /metrics. Values are per worker process; scrape each worker (or sum) as usual.
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Iterable[str], values: LabelValues) -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        # Unlabelled metrics are exported as 0 from the start
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0.0}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, value in self.samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Gauge set directly, or computed on scrape when a callback is given."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 callback: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, help_text, labelnames)
+        self.callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        if self.callback is not None:
+            return [(self.name, key, value) for key, value in self.callback().items()]
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Cumulative buckets plus _sum and _count, as Prometheus expects."""
+
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> per-bucket counts followed by sum and count
+        self._values = {} if self.labelnames else {(): self._empty()}
+
+    def _empty(self) -> List[float]:
+        return [0.0] * (len(self.buckets) + 2)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = self._empty()
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def value(self, **labels: str) -> float:
+        """Number of observations."""
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0.0
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        samples = []
+        with self._lock:
+            for key, state in self._values.items():
+                for bound, count in zip(self.buckets, state):
+                    samples.append((f"{self.name}_bucket", key + (f"{bound:g}",), count))
+                samples.append((f"{self.name}_bucket", key + ("+Inf",), state[-1]))
+                samples.append((f"{self.name}_sum", key, state[-2]))
+                samples.append((f"{self.name}_count", key, state[-1]))
+        return samples
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        bucket_labels = self.labelnames + ("le",)
+        for name, key, value in self.samples():
+            labelnames = bucket_labels if name.endswith("_bucket") else self.labelnames
+            lines.append(f"{name}{_format_labels(labelnames, key)} {value:g}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        # Re-registering a name returns the existing metric (module reloads in dev)
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+    return registry.register(Counter(name, help_text, labelnames))
+
+
+def gauge(name: str, help_text: str, labelnames: Iterable[str] = (),
+          callback: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> Gauge:
+    return registry.register(Gauge(name, help_text, labelnames, callback))
+
+
+def histogram(name: str, help_text: str, labelnames: Iterable[str] = (),
+              buckets: Iterable[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, help_text, labelnames, buckets))
@@ -2,7 +2,7 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, String, DateTime, Integer, Text, Boolean, ForeignKey
+from sqlalchemy import Column, String, DateTime, Date, Integer, BigInteger, Text, Boolean, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -63,6 +63,36 @@ class ReplyCreate(BaseModel):
     service_type: str = Field(..., description="Social media platform key (e.g., 'x', 'facebook', 'linkedin')")
     tone_type: Optional[str] = Field(None, description="Tone used for the reply")
 
+class ReplyBatchEvent(ReplyCreate):
+    client_event_id: str = Field(..., min_length=1, max_length=64, description="Client-generated idempotency id; retries with the same id are ignored")
+    client_timestamp: Optional[datetime] = Field(None, description="When the reply was generated on the client (UTC)")
+
+class ReplyBatchCreate(BaseModel):
+    events: List[ReplyBatchEvent] = Field(..., description="Queued reply events, oldest first")
+    client_id: Optional[str] = Field(None, min_length=16, max_length=64, description="Random per-install id; required without auth, it scopes the client_event_ids")
+
+class ReplyBatchResponse(BaseResponse):
+    accepted: int  # Newly stored events
+    duplicates: int  # Events already stored by an earlier attempt
+    accepted_event_ids: List[str]
+
+class ReplyPurgeRequest(BaseModel):
+    since: Optional[datetime] = Field(None, description="Delete replies created at or after this UTC time")
+    until: Optional[datetime] = Field(None, description="Delete replies created before this UTC time")
+
+class PurgeJobStatus(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed
+    scope: str  # range, all, deactivated_account
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    deleted: int = 0
+    total_estimate: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
 class ReplyResponse(BaseModel):
     id: str
     user_id: Optional[str] = None  # Only included if user was logged in
@@ -79,6 +109,19 @@ class DashboardStats(BaseModel):
     top_services: List[Dict[str, Any]]    # [{"service": "x", "count": 10, "percentage": 50.0}]
     top_tones: List[Dict[str, Any]]       # [{"tone": "helpful", "count": 8, "percentage": 40.0}]
 
+class DailyUsage(BaseModel):
+    date: str  # "2025-01-01"
+    total_replies: int
+    active_users: Optional[int] = None  # Approximate (HyperLogLog); None when Redis is unavailable
+    platforms: Dict[str, int]
+    tones: Dict[str, int]
+
+class GlobalAnalytics(BaseModel):
+    days: List[DailyUsage]  # Oldest to newest
+    daily_active_users: Optional[int] = None  # Today
+    weekly_active_users: Optional[int] = None  # Last 7 days including today
+    monthly_active_users: Optional[int] = None  # Calendar month to date
+
 class RecentActivity(BaseModel):
     replies: List[ReplyResponse]  # Only contains: id, service_type, created_at (no sensitive data)
     total_count: int
@@ -169,16 +212,48 @@ class User(Base):
 
 class Reply(Base):
     __tablename__ = "replies"
+    # Append-only event log: monthly RANGE partitions on created_at (see app/partitions.py)
+    __table_args__ = (
+        Index("ix_replies_user_id_created_at", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True, index=True)  # NULL if user not logged in
     service_type = Column(String, nullable=False, index=True)  # e.g., "x", "facebook", "linkedin"
     tone_type = Column(String, nullable=True, index=True)  # The tone used: preset name or "custom" for user tones
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow, nullable=False, index=True)  # Partition key, so part of the PK
     
     # Relationships
     user = relationship("User", back_populates="replies")
 
+class ReplyIngestKey(Base):
+    """Idempotency ids claimed by POST /replies/batch, pruned after the retry window"""
+    __tablename__ = "reply_ingest_keys"
+    
+    scope = Column(String, primary_key=True)  # User UUID, or "anonymous:<client_id>"
+    client_event_id = Column(String, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class ReplyDailyRollup(Base):
+    """Global per-day reply counts by platform and tone, folded in from reply_rollup_deltas"""
+    __tablename__ = "reply_daily_rollups"
+    
+    day = Column(Date, primary_key=True)
+    service_type = Column(String, primary_key=True)
+    tone_type = Column(String, primary_key=True)  # "" when no tone was recorded
+    reply_count = Column(BigInteger, nullable=False, default=0)
+
+class ReplyRollupDelta(Base):
+    """Rollup increments appended by reply writes; compacted into reply_daily_rollups in the background"""
+    __tablename__ = "reply_rollup_deltas"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    day = Column(Date, nullable=False)
+    service_type = Column(String, nullable=False)
+    tone_type = Column(String, nullable=False)  # "" when no tone was recorded
+    reply_count = Column(BigInteger, nullable=False)
+
 class ExternalServiceUrl(Base):
     __tablename__ = "external_service_urls"
     
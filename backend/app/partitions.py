@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+# `replies` is declared with PARTITION BY RANGE (created_at); one child table per month.
+PARENT_TABLE = "replies"
+PARTITION_NAME_RE = re.compile(r"^replies_(\d{4})_(\d{2})$")
+
+
+def month_start(value: datetime) -> datetime:
+    """Truncate a timestamp to the first instant of its month."""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Shift a month-start timestamp by a number of months."""
+    month_index = value.year * 12 + (value.month - 1) + months
+    return value.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT_TABLE}_{month.year:04d}_{month.month:02d}"
+
+
+def partition_ddl(month: datetime) -> str:
+    """CREATE statement for the partition holding `month` (idempotent)."""
+    lower = month_start(month)
+    upper = add_months(lower, 1)
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(lower)}" PARTITION OF "{PARENT_TABLE}" '
+        f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+    )
+
+
+def months_between(start: datetime, end: datetime) -> List[datetime]:
+    """Every month start from start's month up to and including end's month."""
+    months = []
+    current = month_start(start)
+    last = month_start(end)
+    while current <= last:
+        months.append(current)
+        current = add_months(current, 1)
+    return months
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+        ),
+        {"name": PARENT_TABLE},
+    )
+    return result.scalar() is not None
+
+
+async def list_reply_partitions(conn: AsyncConnection) -> List[Tuple[str, datetime]]:
+    """Attached monthly partitions as (table name, month start), oldest first."""
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = :name AND pg_table_is_visible(parent.oid)"
+        ),
+        {"name": PARENT_TABLE},
+    )
+    partitions = []
+    for (name,) in result:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+async def ensure_reply_partitions(conn: AsyncConnection, start: datetime, end: datetime) -> List[str]:
+    """Create any missing monthly partitions covering [start, end]."""
+    existing = {name for name, _ in await list_reply_partitions(conn)}
+    created = []
+    for month in months_between(start, end):
+        name = partition_name(month)
+        if name in existing:
+            continue
+        await conn.execute(text(partition_ddl(month)))
+        created.append(name)
+    return created
+
+
+async def apply_retention(conn: AsyncConnection, now: datetime) -> List[str]:
+    """Detach or drop whole partitions older than the retention window.
+
+    Dropping a partition is a metadata operation, so old analytics go away without
+    row-by-row DELETEs, WAL churn or vacuum debt. Detached partitions stay around
+    as plain tables for archiving.
+    """
+    if settings.replies_retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(now), -settings.replies_retention_months)
+    removed = []
+    for name, month in await list_reply_partitions(conn):
+        if add_months(month, 1) > cutoff:
+            break
+        if settings.replies_retention_action == "drop":
+            await conn.execute(text(f'DROP TABLE "{name}"'))
+        else:
+            await conn.execute(text(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{name}"'))
+        removed.append(name)
+    return removed
+
+
+async def prune_ingest_keys(conn: AsyncConnection, now: datetime) -> int:
+    """Forget batch idempotency ids once clients can no longer retry them."""
+    cutoff = now - timedelta(days=settings.replies_idempotency_window_days)
+    result = await conn.execute(
+        text("DELETE FROM reply_ingest_keys WHERE created_at < :cutoff"),
+        {"cutoff": cutoff},
+    )
+    return result.rowcount or 0
+
+
+async def run_partition_maintenance() -> Dict[str, Any]:
+    """Create upcoming partitions and enforce retention in one transaction."""
+    now = datetime.utcnow()
+    async with engine.begin() as conn:
+        if not await is_partitioned(conn):
+            logger.warning(
+                "replies table is not partitioned; run `alembic upgrade head` to migrate it"
+            )
+            return {"partitioned": False, "created": [], "removed": []}
+        # Batch ingestion accepts client timestamps this far back, so cover them too
+        earliest = now - timedelta(days=settings.replies_batch_max_event_age_days)
+        created = await ensure_reply_partitions(
+            conn, earliest, add_months(month_start(now), settings.replies_partition_months_ahead)
+        )
+        removed = await apply_retention(conn, now)
+        pruned_keys = await prune_ingest_keys(conn, now)
+    if created:
+        logger.info(f"Created reply partitions: {', '.join(created)}")
+    if removed:
+        logger.info(f"Reply partitions removed by retention ({settings.replies_retention_action}): {', '.join(removed)}")
+    return {"partitioned": True, "created": created, "removed": removed, "pruned_ingest_keys": pruned_keys}
+
+
+async def partition_maintenance_loop() -> None:
+    """Background job keeping future partitions ahead of the clock."""
+    while True:
+        await asyncio.sleep(settings.partition_maintenance_interval_seconds)
+        try:
+            await run_partition_maintenance()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Reply partition maintenance failed: {e}")
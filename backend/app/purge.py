@@ -0,0 +1,152 @@
+import asyncio
+import contextvars
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy import select, delete, func, and_, tuple_
+
+from app.cache import redis_cache
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.http_cache import bump_user_data_version, REPLY_STATS_NAMESPACE
+from app.models import Reply, PurgeJobStatus
+from app.query_timeouts import without_db_timeouts
+
+logger = logging.getLogger(__name__)
+
+# Job status lives in this process and, when available, in Redis so any worker can report progress
+_jobs: Dict[str, Dict[str, Any]] = {}
+# Running jobs; the event loop only keeps weak references to tasks
+_running: Set[asyncio.Task] = set()
+
+
+def job_cache_key(job_id: str) -> str:
+    return f"purge:job:{job_id}"
+
+
+async def save_job(job: PurgeJobStatus, owner_id: uuid.UUID) -> None:
+    record = {"owner_id": str(owner_id), "job": job.model_dump(mode="json")}
+    _jobs[job.job_id] = record
+    await redis_cache.set_json(job_cache_key(job.job_id), record, settings.purge_job_ttl_seconds)
+
+
+async def get_job(job_id: str, owner_id: uuid.UUID) -> Optional[PurgeJobStatus]:
+    """Job status if it exists and belongs to owner_id"""
+    record = _jobs.get(job_id) or await redis_cache.get_json(job_cache_key(job_id))
+    if not record or record["owner_id"] != str(owner_id):
+        return None
+    return PurgeJobStatus(**record["job"])
+
+
+def prune_finished_jobs(now: datetime) -> None:
+    for job_id, record in list(_jobs.items()):
+        finished_at = record["job"].get("finished_at")
+        if finished_at and (now - datetime.fromisoformat(finished_at)).total_seconds() > settings.purge_job_ttl_seconds:
+            del _jobs[job_id]
+
+
+async def create_purge_job(
+    owner_id: uuid.UUID,
+    scope: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> PurgeJobStatus:
+    now = datetime.utcnow()
+    prune_finished_jobs(now)
+    job = PurgeJobStatus(
+        job_id=str(uuid.uuid4()),
+        status="queued",
+        scope=scope,
+        since=since,
+        until=until,
+        created_at=now
+    )
+    await save_job(job, owner_id)
+    return job
+
+
+def purge_filter(user_id: uuid.UUID, since: Optional[datetime], until: Optional[datetime]):
+    conditions = [Reply.user_id == user_id]
+    if since:
+        conditions.append(Reply.created_at >= since)
+    if until:
+        conditions.append(Reply.created_at < until)
+    return and_(*conditions)
+
+
+def start_purge_job(job: PurgeJobStatus, user_id: uuid.UUID, user_supabase_id: Optional[str] = None) -> None:
+    """Run a purge job detached from the request that created it.
+
+    Not a BackgroundTasks task: those run before the request's dependencies
+    are torn down, so its session would stay checked out for the whole
+    throttled run. A fresh context also keeps the request's SQL stats and
+    statement/lock timeouts off the job.
+    """
+    task = asyncio.get_running_loop().create_task(
+        run_purge_job(job, user_id, user_supabase_id), context=contextvars.Context()
+    )
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+
+@without_db_timeouts
+async def run_purge_job(job: PurgeJobStatus, user_id: uuid.UUID, user_supabase_id: Optional[str] = None) -> None:
+    """Delete a user's replies in small primary-key-keyed chunks.
+
+    Each chunk selects the next `purge_chunk_size` (created_at, id) keys after the
+    previous chunk, deletes exactly those rows and commits, then sleeps for the
+    throttle interval. Transactions stay short, locks are held briefly and WAL
+    is written at a steady rate instead of one huge burst.
+    """
+    condition = purge_filter(user_id, job.since, job.until)
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    try:
+        async with AsyncSessionLocal() as db:
+            count_result = await db.execute(select(func.count(Reply.id)).where(condition))
+            job.total_estimate = count_result.scalar() or 0
+            await db.commit()
+            await save_job(job, user_id)
+
+            last_key = None
+            while True:
+                chunk_query = select(Reply.created_at, Reply.id).where(condition)
+                if last_key is not None:
+                    chunk_query = chunk_query.where(tuple_(Reply.created_at, Reply.id) > last_key)
+                chunk_result = await db.execute(
+                    chunk_query.order_by(Reply.created_at, Reply.id).limit(settings.purge_chunk_size)
+                )
+                keys = chunk_result.all()
+                if not keys:
+                    break
+
+                # Bounding created_at to the chunk keeps the delete on the partitions it touches
+                await db.execute(
+                    delete(Reply)
+                    .where(and_(
+                        Reply.user_id == user_id,
+                        Reply.created_at >= keys[0][0],
+                        Reply.created_at <= keys[-1][0],
+                        Reply.id.in_([reply_id for _, reply_id in keys])
+                    ))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+
+                last_key = tuple(keys[-1])
+                job.deleted += len(keys)
+                await save_job(job, user_id)
+                if user_supabase_id:
+                    await bump_user_data_version(REPLY_STATS_NAMESPACE, user_supabase_id)
+                if settings.purge_throttle_seconds > 0:
+                    await asyncio.sleep(settings.purge_throttle_seconds)
+
+        job.status = "completed"
+    except Exception as e:
+        logger.error(f"Reply purge job {job.job_id} failed: {e}")
+        job.status = "failed"
+        job.error = str(e)
+    job.finished_at = datetime.utcnow()
+    await save_job(job, user_id)
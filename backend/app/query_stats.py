@@ -0,0 +1,178 @@
+import functools
+import logging
+import time
+from collections import Counter as StatementCounter
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.config import settings
+from app.metrics import counter, histogram
+from app.slow_queries import observe as observe_slow_query, register_engine
+
+logger = logging.getLogger(__name__)
+
+# Every statement run through the engines is attributed to the request that
+# caused it (via a contextvar set by QueryStatsMiddleware). Statements carry
+# bound-parameter placeholders, so identical text is identical "shape".
+
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 20, 30, 50, 100)
+
+statement_duration = histogram(
+    "db_statement_duration_seconds", "Duration of each SQL statement (all engines)"
+)
+request_queries = histogram(
+    "db_request_queries", "SQL statements run per request", ["route"], buckets=QUERY_COUNT_BUCKETS
+)
+request_query_seconds = histogram(
+    "db_request_query_seconds", "Total SQL time per request", ["route"]
+)
+query_budget_exceeded = counter(
+    "db_query_budget_exceeded_total", "Requests that ran more statements than SQL_QUERY_BUDGET", ["route"]
+)
+repeated_statements = counter(
+    "db_repeated_statements_total",
+    "Requests that ran one statement shape SQL_REPEATED_STATEMENT_THRESHOLD+ times (likely N+1)", ["route"]
+)
+
+
+class RequestQueryStats:
+    """SQL activity of one request."""
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.shapes: StatementCounter = StatementCounter()
+
+    @property
+    def route(self) -> str:
+        """Route template (e.g. /api/v1/replies/{reply_id}) once routing has happened."""
+        route = self.scope.get("route") if self.scope else None
+        path = getattr(route, "path", None)
+        if path is None:
+            return "-"
+        return f"{self.scope.get('method', '')} {path}".strip()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.shapes[statement] += 1
+        if seconds >= self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-DB-Query-Count": str(self.count),
+            "X-DB-Query-Time-Ms": f"{self.total_seconds * 1000:.1f}",
+            "X-DB-Slowest-Query-Ms": f"{self.slowest_seconds * 1000:.1f}",
+        }
+
+
+current_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def without_query_stats(func):
+    """Run a coroutine function outside any request's stats.
+
+    For work that may outlive the request it was started from (background
+    tasks, shared cache loads); its SQL would otherwise be attributed to that
+    request, often after the request was already reported.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = current_query_stats.set(None)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            current_query_stats.reset(token)
+    return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    seconds = time.perf_counter() - started
+    statement_duration.observe(seconds)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    observe_slow_query(conn, statement, parameters, seconds, stats.route if stats is not None else "-")
+
+
+def _handle_error(context):
+    # Keep the start-time stack balanced when a statement fails
+    if context.connection is not None and context.cursor is not None:
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+def instrument_engine(async_engine) -> None:
+    """Attach the timing hooks to an AsyncEngine (idempotent)."""
+    sync_engine = async_engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+    register_engine(async_engine)
+
+
+def report(stats: RequestQueryStats) -> None:
+    """Export one finished request's numbers and warn about budget/N+1 problems."""
+    if not stats.count:
+        return
+    route = stats.route
+    request_queries.observe(stats.count, route=route)
+    request_query_seconds.observe(stats.total_seconds, route=route)
+
+    if settings.sql_query_budget and stats.count > settings.sql_query_budget:
+        query_budget_exceeded.inc(route=route)
+        logger.warning(
+            f"{route} ran {stats.count} SQL statements (budget {settings.sql_query_budget}), "
+            f"{stats.total_seconds * 1000:.1f}ms total"
+        )
+    statement, repeats = stats.shapes.most_common(1)[0]
+    if settings.sql_repeated_statement_threshold and repeats >= settings.sql_repeated_statement_threshold:
+        repeated_statements.inc(route=route)
+        logger.warning(f"{route} ran the same statement {repeats} times (N+1?): {' '.join(statement.split())[:200]}")
+
+
+class QueryStatsMiddleware(BaseHTTPMiddleware):
+    """Collect per-request SQL stats; adds X-DB-* headers outside production.
+
+    Metrics are reported once the body has been sent, so streamed bodies
+    (e.g. /replies/export) are included; the headers go out before the body
+    and only cover the handler's own statements.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        stats = RequestQueryStats(request.scope)
+        token = current_query_stats.set(stats)
+        try:
+            response = await call_next(request)
+        finally:
+            current_query_stats.reset(token)
+        if settings.environment != "production":
+            response.headers.update(stats.headers())
+        body = response.body_iterator
+
+        async def reported_body():
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                report(stats)
+
+        response.body_iterator = reported_body()
+        return response
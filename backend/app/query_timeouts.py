@@ -0,0 +1,202 @@
+import asyncio
+import functools
+import logging
+from contextvars import ContextVar
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.metrics import counter
+from app.slow_queries import unobserved
+
+logger = logging.getLogger(__name__)
+
+# Every request's transactions run with statement_timeout/lock_timeout set via
+# SET LOCAL (set_config(..., true)), so they stay inside the transaction and
+# are safe behind PgBouncer. Defaults come from DATABASE_STATEMENT_TIMEOUT_MS
+# and DATABASE_LOCK_TIMEOUT_MS; a route can tighten them:
+#
+#   @router.get("/stats", dependencies=[Depends(db_timeouts(statement_ms=5000))])
+#
+# A query hitting either limit surfaces as DatabaseTimeout (503 + Retry-After),
+# also when a handler's catch-all wraps it in a 500. GET/HEAD requests whose
+# client disconnects are cancelled, which cancels their in-flight query.
+#
+# The timeouts follow the contextvar into anything the request starts,
+# including Starlette BackgroundTasks (they run before this middleware
+# returns). Long-running jobs start in a fresh context (purge.start_purge_job)
+# or are wrapped in without_db_timeouts, and then run with the server defaults.
+
+# SQLSTATEs: query_canceled (statement_timeout, pg_cancel_backend), lock_not_available
+TIMEOUT_SQLSTATES = {"57014": "statement", "55P03": "lock"}
+CANCELLABLE_METHODS = {"GET", "HEAD"}
+
+SET_TIMEOUTS = text(
+    "SELECT set_config('statement_timeout', :statement_ms, true), set_config('lock_timeout', :lock_ms, true)"
+)
+
+statement_timeouts = counter(
+    "db_statement_timeouts_total", "Statements cancelled by statement_timeout or lock_timeout", ["kind"]
+)
+disconnect_cancellations = counter(
+    "http_disconnect_cancellations_total", "Requests cancelled because the client went away", ["route"]
+)
+
+
+class DbTimeouts(NamedTuple):
+    statement_ms: int
+    lock_ms: int
+
+
+current_db_timeouts: ContextVar[Optional[DbTimeouts]] = ContextVar("current_db_timeouts", default=None)
+
+
+class DatabaseTimeout(HTTPException):
+    """A query ran past its statement or lock timeout."""
+
+    def __init__(self, kind: str):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Database {kind} timeout, please retry",
+            headers={"Retry-After": str(settings.database_timeout_retry_after_seconds)},
+        )
+        self.kind = kind
+
+
+def default_timeouts() -> DbTimeouts:
+    return DbTimeouts(settings.database_statement_timeout_ms, settings.database_lock_timeout_ms)
+
+
+def db_timeouts(statement_ms: Optional[int] = None, lock_ms: Optional[int] = None):
+    """Route dependency overriding the request's timeouts (0 means none)."""
+    async def apply() -> None:
+        # Async on purpose: sync dependencies run in a thread with a copied context
+        current = current_db_timeouts.get() or default_timeouts()
+        current_db_timeouts.set(DbTimeouts(
+            current.statement_ms if statement_ms is None else statement_ms,
+            current.lock_ms if lock_ms is None else lock_ms,
+        ))
+    return apply
+
+
+def without_db_timeouts(func):
+    """Run a coroutine function with the server's default timeouts, not the request's."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = current_db_timeouts.set(None)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            current_db_timeouts.reset(token)
+    return wrapper
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_timeouts(session, transaction, connection) -> None:
+    # No timeouts in context (startup, detached jobs): the server defaults apply
+    timeouts = current_db_timeouts.get()
+    if timeouts is None or not any(timeouts) or connection.dialect.name != "postgresql":
+        return
+    connection.execute(SET_TIMEOUTS, {
+        "statement_ms": str(timeouts.statement_ms), "lock_ms": str(timeouts.lock_ms)
+    })
+
+
+def database_timeout(exc: BaseException) -> Optional[DatabaseTimeout]:
+    """The DatabaseTimeout behind an exception, if a handler wrapped one."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, DatabaseTimeout):
+            return exc
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def _handle_error(context):
+    kind = TIMEOUT_SQLSTATES.get(getattr(context.original_exception, "sqlstate", None))
+    if kind is None:
+        return None
+    if context.connection is not None and unobserved(context.connection):
+        return None  # a slow-query EXPLAIN hitting its own bound
+    statement_timeouts.inc(kind=kind)
+    logger.warning(f"SQL {kind} timeout: {' '.join((context.statement or '').split())[:200]}")
+    return DatabaseTimeout(kind)
+
+
+def guard_engine(async_engine) -> None:
+    """Raise DatabaseTimeout for statement/lock timeouts on this engine (idempotent)."""
+    sync_engine = async_engine.sync_engine
+    if not event.contains(sync_engine, "handle_error", _handle_error):
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+
+class QueryGuardMiddleware:
+    """Apply the default DB timeouts to each request and cancel reads whose client disconnected.
+
+    Plain ASGI rather than BaseHTTPMiddleware: it has to own `receive` to
+    notice the disconnect while the handler is still running.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = current_db_timeouts.set(default_timeouts())
+        try:
+            if not settings.database_cancel_on_disconnect or scope["method"] not in CANCELLABLE_METHODS:
+                return await self.app(scope, receive, send)
+            await self._run_cancellable(scope, receive, send)
+        finally:
+            current_db_timeouts.reset(token)
+
+    async def _run_cancellable(self, scope, receive, send):
+        messages: asyncio.Queue = asyncio.Queue()
+        disconnect = None
+        response_complete = False
+
+        async def guarded_receive():
+            nonlocal disconnect
+            if disconnect is not None:
+                return disconnect
+            message = await messages.get()
+            if message["type"] == "http.disconnect":
+                disconnect = message
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        app_task = asyncio.ensure_future(self.app(scope, guarded_receive, guarded_send))
+
+        async def watch():
+            # Sole reader of the server's receive; the app reads through the queue
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    break
+            if not response_complete and not app_task.done():
+                route = getattr(scope.get("route"), "path", scope["path"])
+                disconnect_cancellations.inc(route=route)
+                logger.info(f"Client disconnected, cancelling {scope['method']} {route}")
+                app_task.cancel()
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not app_task.cancelled():
+                raise
+        finally:
+            watcher.cancel()
+            if not app_task.done():
+                app_task.cancel()
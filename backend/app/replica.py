@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import event, text
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.cache import redis_cache
+from app.config import settings
+from app.database import AsyncSessionLocal, LazySession, ReplicaSessionLocal, lazy_session_scope, replica_engine
+from app.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+# Read-only endpoints take `db = Depends(get_read_db)` and are served by the
+# replica (DATABASE_REPLICA_URL) when one is configured and healthy. After a
+# user's own successful write they are pinned to the primary for
+# DATABASE_REPLICA_PIN_SECONDS, so they never read their way back to
+# pre-write data (or cache it under a freshly bumped generation).
+
+RECENT_WRITE_PREFIX = "recent_write"
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Replication lag: 0 while the replica has replayed everything it received,
+# so an idle primary doesn't look like growing lag. NULL (not in recovery) -> 0.
+LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+read_sessions = counter(
+    "db_read_sessions_total", "Read-routed sessions by target and reason", ["target", "reason"]
+)
+
+
+class ReplicaHealth:
+    """Replica state maintained by replica_health_loop; starts down until the first check passes."""
+
+    def __init__(self):
+        self.up = False
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def mark_down(self, reason: str) -> None:
+        if self.up:
+            logger.warning(f"Read replica marked down, reads go to the primary: {reason}")
+        self.up = False
+        self.last_error = reason
+
+    def status(self) -> Dict[str, Any]:
+        if replica_engine is None:
+            return {"configured": False}
+        return {
+            "configured": True,
+            "up": self.up,
+            "lag_seconds": self.lag_seconds,
+            "checked_seconds_ago": round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+            "last_error": self.last_error,
+        }
+
+
+replica_health = ReplicaHealth()
+
+if replica_engine is not None:
+    @event.listens_for(replica_engine.sync_engine, "handle_error")
+    def _replica_error(context) -> None:
+        # Dropped connections take the replica out right away; the loop restores it
+        if context.is_disconnect:
+            replica_health.mark_down(str(context.original_exception))
+
+
+async def check_replica() -> None:
+    try:
+        async with replica_engine.connect() as conn:
+            lag = float((await conn.execute(LAG_QUERY)).scalar() or 0)
+    except Exception as e:
+        replica_health.mark_down(str(e))
+        replica_health.checked_at = time.monotonic()
+        return
+    replica_health.lag_seconds = round(lag, 3)
+    replica_health.checked_at = time.monotonic()
+    if lag > settings.database_replica_max_lag_seconds:
+        replica_health.mark_down(f"replication lag {lag:.1f}s")
+        return
+    if not replica_health.up:
+        logger.info("Read replica is up")
+    replica_health.up = True
+    replica_health.last_error = None
+
+
+async def replica_health_loop() -> None:
+    """Check the replica's reachability and lag every DATABASE_REPLICA_HEALTH_INTERVAL_SECONDS."""
+    if replica_engine is None:
+        return
+    while True:
+        await check_replica()
+        await asyncio.sleep(settings.database_replica_health_interval_seconds)
+
+
+def token_subject(request: Request) -> Optional[str]:
+    """JWT `sub` without verifying the signature.
+
+    Only used to choose a database; a forged value at worst pins that caller
+    to the primary. Authentication still happens in get_current_user.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        return None
+
+
+async def mark_recent_write(subject: str) -> None:
+    await redis_cache.set_flag(f"{RECENT_WRITE_PREFIX}:{subject}", settings.database_replica_pin_seconds)
+
+
+async def read_target(request: Optional[Request] = None) -> Tuple[str, str]:
+    """(target, reason) for a read: the replica unless it's missing, down or the user just wrote."""
+    if replica_engine is None:
+        return "primary", "no_replica"
+    if not replica_health.up:
+        return "primary", "replica_down"
+    subject = token_subject(request) if request is not None else None
+    if subject:
+        # Markers written by other workers are only visible through Redis; the
+        # in-process fallback is per worker, so without Redis pin to the primary
+        recent = await redis_cache.has_flag(f"{RECENT_WRITE_PREFIX}:{subject}")
+        if recent is None:
+            return "primary", "markers_unavailable"
+        if recent:
+            return "primary", "recent_write"
+    return "replica", "replica"
+
+
+def read_session_factory(target: str):
+    return ReplicaSessionLocal if target == "replica" else AsyncSessionLocal
+
+
+async def get_read_db(request: Request):
+    """get_db for read-only endpoints: replica session when safe, else the primary.
+
+    The choice (and its recent-write lookup) is made on the session's first
+    use, so requests served from cache skip it entirely.
+    """
+    async def route():
+        target, reason = await read_target(request)
+        read_sessions.inc(target=target, reason=reason)
+        return read_session_factory(target)
+
+    async with lazy_session_scope(LazySession(route, fallback=AsyncSessionLocal)) as session:
+        yield session
+
+
+class RecentWriteMiddleware(BaseHTTPMiddleware):
+    """Pin the caller to the primary for a short window after each successful write."""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        if request.method in MUTATING_METHODS and response.status_code < 400:
+            subject = token_subject(request)
+            if subject:
+                await mark_recent_write(subject)
+        return response
+
+
+gauge(
+    "db_replica_up", "1 while the read replica is reachable and within the lag limit",
+    callback=lambda: {(): 1.0 if replica_health.up else 0.0}
+)
+gauge(
+    "db_replica_lag_seconds", "Replication lag seen by the last replica health check",
+    callback=lambda: {(): replica_health.lag_seconds or 0.0}
+)
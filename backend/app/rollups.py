@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, cast, func, insert, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import redis_cache
+from app.config import settings
+from app.database import engine
+from app.models import ReplyDailyRollup, ReplyRollupDelta
+
+logger = logging.getLogger(__name__)
+
+# Reply writes only append to reply_rollup_deltas, so concurrent writers never
+# wait on a shared (day, service_type, tone_type) counter row. A background job
+# folds the deltas into reply_daily_rollups; reads add any deltas not yet
+# folded, so counts are exact at all times.
+
+NO_TONE = ""
+# pg_advisory_xact_lock key: one compaction at a time across workers
+COMPACT_LOCK_ID = 0x726f6c6c  # "roll"
+
+COMPACT_ROLLUPS = text("""
+WITH moved AS (
+    DELETE FROM reply_rollup_deltas
+    RETURNING day, service_type, tone_type, reply_count
+)
+INSERT INTO reply_daily_rollups (day, service_type, tone_type, reply_count)
+SELECT day, service_type, tone_type, sum(reply_count) FROM moved
+GROUP BY day, service_type, tone_type
+ORDER BY day, service_type, tone_type
+ON CONFLICT (day, service_type, tone_type)
+DO UPDATE SET reply_count = reply_daily_rollups.reply_count + EXCLUDED.reply_count
+""")
+# Daily HLLs are ~12KB each; keep a bit over a year for month/week unions
+ACTIVE_USERS_TTL_SECONDS = 400 * 86400
+# Merged month-to-date HLL is rebuilt at most this often
+MONTH_MERGE_TTL_SECONDS = 300
+
+
+def dau_key(day: date) -> str:
+    return f"hll:dau:{day.isoformat()}"
+
+
+def mau_key(month: date) -> str:
+    return f"hll:mau:{month:%Y-%m}"
+
+
+async def record_reply_rollups(db: AsyncSession, events: Iterable[Tuple[datetime, str, Optional[str]]]) -> None:
+    """Append (created_at, service_type, tone_type) events as rollup deltas.
+
+    Runs in the caller's transaction so rollups commit atomically with the
+    replies. A plain INSERT of new rows: no row locks shared with other writers.
+    """
+    counts = Counter(
+        (created_at.date(), service_type, tone_type or NO_TONE)
+        for created_at, service_type, tone_type in events
+    )
+    if not counts:
+        return
+    await db.execute(insert(ReplyRollupDelta).values([
+        {"day": day, "service_type": service_type, "tone_type": tone_type, "reply_count": count}
+        for (day, service_type, tone_type), count in counts.items()
+    ]))
+
+
+async def compact_reply_rollups() -> Optional[int]:
+    """Fold all committed deltas into reply_daily_rollups in one transaction.
+
+    Returns the number of rollup rows touched, or None if another worker is
+    compacting. Deltas committed meanwhile are left for the next run.
+    """
+    async with engine.begin() as conn:
+        locked = await conn.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": COMPACT_LOCK_ID})
+        if not locked.scalar():
+            return None
+        result = await conn.execute(COMPACT_ROLLUPS)
+    return result.rowcount or 0
+
+
+async def rollup_compaction_loop() -> None:
+    """Background job folding rollup deltas every reply_rollup_compact_interval_seconds."""
+    while True:
+        await asyncio.sleep(settings.reply_rollup_compact_interval_seconds)
+        try:
+            await compact_reply_rollups()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Reply rollup compaction failed: {e}")
+
+
+async def track_active_users(events: Iterable[Tuple[datetime, str]]) -> None:
+    """PFADD (created_at, user id) pairs into per-day HyperLogLogs in one round trip. Best-effort."""
+    users_by_day: Dict[date, set] = defaultdict(set)
+    for created_at, user_id in events:
+        users_by_day[created_at.date()].add(user_id)
+    await redis_cache.pfadd_many(
+        {dau_key(day): user_ids for day, user_ids in users_by_day.items()},
+        ttl_seconds=ACTIVE_USERS_TTL_SECONDS
+    )
+
+
+async def load_daily_rollups(db: AsyncSession, start: date, end: date) -> List[Any]:
+    """Rollup rows for [start, end] plus not yet compacted deltas.
+
+    Size depends on days x platforms x tones (and one compaction interval of
+    deltas), never on reply volume. Rows have day, service_type, tone_type
+    and reply_count.
+    """
+    combined = union_all(*(
+        select(model.day, model.service_type, model.tone_type, model.reply_count)
+        .where(model.day >= start, model.day <= end)
+        for model in (ReplyDailyRollup, ReplyRollupDelta)
+    )).subquery()
+    result = await db.execute(
+        select(
+            combined.c.day, combined.c.service_type, combined.c.tone_type,
+            cast(func.sum(combined.c.reply_count), BigInteger).label("reply_count")
+        )
+        .group_by(combined.c.day, combined.c.service_type, combined.c.tone_type)
+        .order_by(combined.c.day)
+    )
+    return list(result.all())
+
+
+async def count_active_users(days: List[date]) -> Optional[int]:
+    """Approximate distinct users across the given days (PFCOUNT over the union)."""
+    return await redis_cache.pfcount(*[dau_key(day) for day in days])
+
+
+async def count_active_users_by_day(days: List[date]) -> Dict[date, Optional[int]]:
+    """Distinct users of each day separately, pipelined into one round trip."""
+    counts = await redis_cache.pfcount_many([dau_key(day) for day in days])
+    return {day: counts[dau_key(day)] for day in days}
+
+
+async def count_monthly_active_users(today: date) -> Optional[int]:
+    """Distinct users this calendar month via a merged month HLL.
+
+    PFMERGE of the month's daily keys is cached for a few minutes, so reads cost
+    one PFCOUNT most of the time and at most one merge of <= 31 keys otherwise.
+    """
+    month_start = today.replace(day=1)
+    key = mau_key(month_start)
+    count = await redis_cache.pfcount(key)
+    if count:
+        return count
+    days = [month_start + timedelta(days=offset) for offset in range((today - month_start).days + 1)]
+    merged = await redis_cache.pfmerge(
+        key, *[dau_key(day) for day in days], ttl_seconds=MONTH_MERGE_TTL_SECONDS
+    )
+    if not merged:
+        return None
+    return await redis_cache.pfcount(key)
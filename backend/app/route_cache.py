@@ -0,0 +1,352 @@
+import base64
+import functools
+import gzip
+import hashlib
+import inspect
+import json
+import logging
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import serialize_response
+
+from app.cache import redis_cache
+from app.config import settings
+from app.database import LazySession, detached_session
+from app.http_cache import (
+    etag_from_versions, etag_matches, not_modified, set_cache_headers, PRIVATE_REVALIDATE
+)
+from app.metrics import counter
+
+# Optional: faster JSON rendering and brotli variants when installed
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Declarative response caching for GET routes:
+#
+#   @router.get("/stats", response_model=DashboardStats)
+#   @cache_route(ttl_seconds=300, tags=[user_tag(REPLY_STATS_NAMESPACE)])
+#   async def get_dashboard_stats(current_user = Depends(get_current_user), ...):
+#
+# Tags are generation-counter namespaces (see RedisCache.bump_version). Their
+# versions are part of the cache key and the ETag, so a write that bumps a tag
+# retires both at once. Mutating routes declare what they touch:
+#
+#   @router.put("/profile", ...)
+#   @invalidates(user_tag(PROFILE_NAMESPACE))
+#
+# Tags may use "{user_id}" (the current user's Supabase id) and path params.
+#
+# What gets cached is the final response body (plus gzip/brotli variants),
+# validated against response_model once when stored; a hit is served as-is
+# without validation or JSON encoding.
+
+# Name of the endpoint parameter holding the authenticated user
+USER_PARAM = "current_user"
+
+KEY_PREFIX = "route"
+
+# Preferred first when the client accepts several equally
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": lambda body: gzip.compress(body, 9, mtime=0)}
+if brotli:
+    COMPRESSORS = {"br": lambda body: brotli.compress(body, quality=9), **COMPRESSORS}
+
+route_cache_requests = counter(
+    "route_cache_requests_total", "Cached route lookups by result", ["route", "result"]
+)
+route_cache_encoded_bytes = counter(
+    "route_cache_response_bytes_total", "Body bytes served from cached routes by content encoding",
+    ["encoding"]
+)
+
+
+class _Uncacheable(Exception):
+    """Raised from the loader when the endpoint returned its own Response."""
+
+    def __init__(self, response: Response):
+        self.response = response
+
+
+def user_tag(resource: str) -> str:
+    """Per-user tag template, e.g. user_tag("users:profile") -> "users:profile:{user_id}"."""
+    return f"{resource}:{{user_id}}"
+
+
+def utc_day() -> List[str]:
+    """Key/ETag extra for responses with "today"-relative windows."""
+    return [datetime.utcnow().strftime("%Y-%m-%d")]
+
+
+def render_json(value: Any) -> bytes:
+    """The body JSONResponse would send for an already jsonable value."""
+    if orjson:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def enabled_encodings() -> List[str]:
+    wanted = {name.strip() for name in settings.route_cache_encodings.split(",") if name.strip()}
+    return [name for name in COMPRESSORS if name in wanted]
+
+
+def encode_body(value: Any) -> Dict[str, str]:
+    """Cache entry for a response: the JSON body plus any smaller compressed variants.
+
+    Compressed bytes are base64 so the entry stays a plain JSON-able value.
+    """
+    body = render_json(value)
+    entry = {"body": body.decode("utf-8")}
+    if len(body) >= settings.route_cache_compress_min_bytes:
+        for encoding in enabled_encodings():
+            compressed = COMPRESSORS[encoding](body)
+            if len(compressed) < len(body):
+                entry[encoding] = base64.b64encode(compressed).decode("ascii")
+    return entry
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Sequence[str]) -> Optional[str]:
+    """Best of the available codings for an Accept-Encoding header (None means identity)."""
+    if not accept_encoding or not available:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def entry_response(entry: Dict[str, Any], request: Request) -> Response:
+    """Serve a cached entry in the best encoding the client accepts."""
+    variants = [encoding for encoding in COMPRESSORS if encoding in entry]
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), variants)
+    headers = {}
+    if encoding:
+        body = base64.b64decode(entry[encoding])
+        headers["Content-Encoding"] = encoding
+    else:
+        body = entry["body"].encode("utf-8")
+    route_cache_encoded_bytes.inc(len(body), encoding=encoding or "identity")
+    response = Response(content=body, media_type="application/json", headers=headers)
+    if variants:
+        response.headers.add_vary_header("Accept-Encoding")
+    return response
+
+
+async def encoded_response(request: Request, key: str, ttl_seconds: int,
+                           loader: Callable[[], Awaitable[Any]],
+                           stale_ttl_seconds: int = 0) -> Tuple[Response, bool]:
+    """RedisCache.cached for whole responses: loader returns a jsonable value,
+    cached as pre-encoded body bytes. Returns (response, was_cached)."""
+    async def load():
+        return encode_body(await loader())
+
+    entry, was_cached = await redis_cache.cached(
+        key, ttl_seconds, load, stale_ttl_seconds=stale_ttl_seconds, negative_ttl_seconds=0
+    )
+    return entry_response(entry, request), was_cached
+
+
+async def response_content(route: Any, result: Any) -> Any:
+    """The jsonable body FastAPI would send for `result`: validated and filtered
+    by the route's response_model (and its include/exclude options)."""
+    field = getattr(route, "response_field", None)
+    if field is None:
+        return jsonable_encoder(result)
+    return await serialize_response(
+        field=field,
+        response_content=result,
+        include=route.response_model_include,
+        exclude=route.response_model_exclude,
+        by_alias=route.response_model_by_alias,
+        exclude_unset=route.response_model_exclude_unset,
+        exclude_defaults=route.response_model_exclude_defaults,
+        exclude_none=route.response_model_exclude_none,
+    )
+
+
+def with_max_age(cache_control: str, seconds: int) -> str:
+    """cache_control with its max-age (if any) replaced by `seconds`."""
+    directives = [
+        directive.strip() for directive in cache_control.split(",")
+        if directive.strip() and not directive.strip().startswith("max-age")
+    ]
+    return ", ".join(directives + [f"max-age={seconds}"])
+
+
+def _timestamp(when: Optional[datetime]) -> Optional[float]:
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)  # Naive datetimes here come from utcnow()
+    return when.timestamp()
+
+
+def _user_id(kwargs: Dict[str, Any]) -> Optional[str]:
+    user = kwargs.get(USER_PARAM)
+    return user.get("id") if isinstance(user, dict) else None
+
+
+def _format_tags(tags: Iterable[str], request: Request, user_id: Optional[str]) -> List[str]:
+    formatted = []
+    for tag in tags:
+        if "{user_id}" in tag and user_id is None:
+            continue  # Anonymous request; there is no per-user data to tag
+        formatted.append(tag.format(user_id=user_id, **request.path_params))
+    return formatted
+
+
+def _with_params(endpoint: Callable, names: Dict[str, type]) -> inspect.Signature:
+    """Endpoint signature plus keyword-only params FastAPI will inject (Request/Response)."""
+    signature = inspect.signature(endpoint)
+    params = list(signature.parameters.values())
+    for name, annotation in names.items():
+        params.append(inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, annotation=annotation))
+    return signature.replace(parameters=params)
+
+
+def cache_route(ttl_seconds: int, tags: Sequence[str] = (),
+                vary: Sequence[str] = ("user", "path", "query"),
+                cache_control: str = PRIVATE_REVALIDATE, vary_header: Optional[str] = None,
+                extra: Optional[Callable[[], Iterable[str]]] = None,
+                expires: Optional[Callable[[Any], Optional[datetime]]] = None,
+                stale_ttl_seconds: int = 0, name: Optional[str] = None):
+    """Cache a GET endpoint's encoded JSON response and answer conditional GETs from tag versions.
+
+    The endpoint's result is validated and filtered by the route's
+    response_model (as FastAPI would) before it is encoded and stored, so
+    hits never carry fields the model leaves out. vary picks the key
+    components ("user", "path", "query"); extra() adds more (e.g. utc_day).
+    expires(result) gives the content's own expiry (e.g. a cache_expires_at
+    column): a hit past it is reloaded, and 200s send max-age up to it.
+    Responses the endpoint builds itself (Response instances) and errors are
+    passed through uncached. stale_ttl_seconds has the same caveat as
+    RedisCache.cached: the refresh outlives the request.
+    """
+    def decorator(endpoint: Callable):
+        route = name or endpoint.__name__
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs.pop("_route_cache_request")
+            if not settings.route_cache_enabled:
+                return await endpoint(*args, **kwargs)
+
+            user_id = _user_id(kwargs)
+            namespaces = _format_tags(tags, request, user_id)
+            extra_parts = list(extra()) if extra else []
+
+            # Redis versions are authoritative (and make the ETag safe to share);
+            # the in-process fallback's are still fine for keys
+            versions = await redis_cache.read_versions(*namespaces) if namespaces else None
+            etag = etag_from_versions(namespaces, versions, extra_parts) if versions is not None else None
+            if versions is None:
+                versions = await redis_cache.get_versions(*namespaces) if namespaces else []
+
+            if etag_matches(request, etag):
+                route_cache_requests.inc(route=route, result="not_modified")
+                return not_modified(etag, cache_control, vary_header)
+
+            parts = [f"{namespace}={version}" for namespace, version in zip(namespaces, versions)]
+            if "user" in vary:
+                parts.append(f"user={user_id or '-'}")
+            if "path" in vary:
+                parts.extend(f"{key}={value}" for key, value in sorted(request.path_params.items()))
+            if "query" in vary:
+                parts.extend(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+            parts.extend(extra_parts)
+            digest = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:24]
+            key = f"{KEY_PREFIX}:{route}:{digest}"
+
+            async def load():
+                # The load is shared by concurrent requests and outlives a
+                # cancelled one, so it gets its own sessions, not this request's
+                async with AsyncExitStack() as stack:
+                    load_kwargs = {
+                        name: await stack.enter_async_context(detached_session(value))
+                        if isinstance(value, LazySession) else value
+                        for name, value in kwargs.items()
+                    }
+                    result = await endpoint(*args, **load_kwargs)
+                if isinstance(result, Response):
+                    raise _Uncacheable(result)
+                entry = encode_body(await response_content(request.scope.get("route"), result))
+                expires_at = _timestamp(expires(result)) if expires else None
+                if expires_at is not None:
+                    entry["expires_at"] = expires_at
+                return entry
+
+            async def lookup():
+                return await redis_cache.cached(
+                    key, ttl_seconds, load, stale_ttl_seconds=stale_ttl_seconds, negative_ttl_seconds=0
+                )
+
+            try:
+                entry, was_cached = await lookup()
+                if was_cached and entry.get("expires_at", float("inf")) <= time.time():
+                    # Still within the route TTL, but the content itself has expired
+                    await redis_cache.delete(key)
+                    entry, was_cached = await lookup()
+            except _Uncacheable as uncacheable:
+                route_cache_requests.inc(route=route, result="bypass")
+                return uncacheable.response
+
+            route_cache_requests.inc(route=route, result="hit" if was_cached else "miss")
+            response = entry_response(entry, request)
+            header = cache_control
+            if "expires_at" in entry:
+                header = with_max_age(cache_control, max(0, int(entry["expires_at"] - time.time())))
+            set_cache_headers(response, etag, header)
+            if vary_header:
+                response.headers.add_vary_header(vary_header)
+            return response
+
+        wrapper.__signature__ = _with_params(endpoint, {"_route_cache_request": Request})
+        return wrapper
+
+    return decorator
+
+
+def invalidates(*tags: str):
+    """Bump the given tags after the endpoint succeeds (errors leave them alone)."""
+    def decorator(endpoint: Callable):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs.pop("_invalidates_request")
+            result = await endpoint(*args, **kwargs)
+            namespaces = _format_tags(tags, request, _user_id(kwargs))
+            if namespaces:
+                try:
+                    await redis_cache.bump_versions(*namespaces)
+                except Exception as e:  # pragma: no cover
+                    logger.debug(f"Failed to bump {namespaces}: {e}")
+            return result
+
+        wrapper.__signature__ = _with_params(endpoint, {"_invalidates_request": Request})
+        return wrapper
+
+    return decorator
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, HTTPException, Depends, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import User, GlobalAnalytics, DailyUsage
+from app.database import get_db
+from app.auth import get_current_admin
+from app.rollups import (
+    NO_TONE, load_daily_rollups, count_active_users, count_active_users_by_day, count_monthly_active_users
+)
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/analytics", tags=["Admin Analytics"])
+
+@router.get("/overview", response_model=GlobalAnalytics)
+async def get_global_analytics(
+    days: int = Query(30, ge=1, le=366),
+    admin: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Global usage (admin only): per-day platform/tone breakdowns and active users
+
+    Breakdowns come from `reply_daily_rollups` (plus uncompacted deltas) and distinct users from
+    per-day Redis HyperLogLogs, so the cost grows with `days`, never with the
+    number of stored replies.
+    """
+    try:
+        today = datetime.utcnow().date()
+        start = today - timedelta(days=days - 1)
+
+        usage = {
+            start + timedelta(days=offset): DailyUsage(
+                date=(start + timedelta(days=offset)).isoformat(),
+                total_replies=0,
+                platforms={},
+                tones={}
+            )
+            for offset in range(days)
+        }
+        for rollup in await load_daily_rollups(db, start, today):
+            day_usage = usage[rollup.day]
+            day_usage.total_replies += rollup.reply_count
+            day_usage.platforms[rollup.service_type] = day_usage.platforms.get(rollup.service_type, 0) + rollup.reply_count
+            if rollup.tone_type != NO_TONE:
+                day_usage.tones[rollup.tone_type] = day_usage.tones.get(rollup.tone_type, 0) + rollup.reply_count
+
+        active_by_day = await count_active_users_by_day(list(usage))
+        for day, day_usage in usage.items():
+            day_usage.active_users = active_by_day[day]
+
+        return GlobalAnalytics(
+            days=list(usage.values()),
+            daily_active_users=usage[today].active_users,
+            weekly_active_users=await count_active_users([today - timedelta(days=offset) for offset in range(7)]),
+            monthly_active_users=await count_monthly_active_users(today)
+        )
+
+    except Exception as e:
+        logger.error(f"Failed to get global analytics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch global analytics: {str(e)}"
+        )
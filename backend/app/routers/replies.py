@@ -1,15 +1,38 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, desc
-from app.models import Reply, User, ReplyCreate, ReplyResponse, DashboardStats, RecentActivity
-from app.database import get_db
+from sqlalchemy import select, func, and_, desc, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models import (
+    Reply, User, ReplyIngestKey, ReplyCreate, ReplyResponse, DashboardStats, RecentActivity,
+    ReplyBatchCreate, ReplyBatchResponse, ReplyPurgeRequest, PurgeJobStatus
+)
+from app.database import get_db, AsyncSessionLocal
 from app.auth import get_current_user, get_optional_user
+from app.replica import get_read_db, read_target, read_session_factory, read_sessions
 from app.cache import redis_cache
+from app.config import settings
+from app.purge import create_purge_job, start_purge_job, get_job
+from app.rollups import record_reply_rollups, track_active_users
+from app.http_cache import REPLY_STATS_NAMESPACE
+from app.route_cache import cache_route, invalidates, user_tag, utc_day
+from app.query_timeouts import db_timeouts
 from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import csv
+import io
+import json
+import uuid
+import zlib
 
 router = APIRouter(prefix="/replies", tags=["Replies - Privacy First Analytics"])
 
+# Rows fetched per server-side cursor round trip when exporting
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ["id", "service_type", "tone_type", "created_at"]
+# Dashboard stats scan a user's whole history; fail fast instead of holding a connection
+STATS_STATEMENT_TIMEOUT_MS = 5000
+
 async def get_or_create_user(db: AsyncSession, supabase_user: Dict[str, Any]) -> User:
     """Get existing user or create new one"""
     # Check if user exists
@@ -32,7 +55,19 @@ async def get_or_create_user(db: AsyncSession, supabase_user: Dict[str, Any]) ->
     
     return user
 
+async def get_or_create_user_for_read(db: AsyncSession, supabase_user: Dict[str, Any]) -> User:
+    """get_or_create_user for get_read_db sessions; a first-time insert goes to the primary"""
+    result = await db.execute(
+        select(User).where(User.supabase_user_id == supabase_user["id"])
+    )
+    user = result.scalar_one_or_none()
+    if user:
+        return user
+    async with AsyncSessionLocal() as primary:
+        return await get_or_create_user(primary, supabase_user)
+
 @router.post("/", response_model=ReplyResponse)
+@invalidates(user_tag(REPLY_STATS_NAMESPACE))
 async def log_reply_usage(
     reply_data: ReplyCreate,
     current_user: Optional[Dict[str, Any]] = Depends(get_optional_user),
@@ -59,13 +94,17 @@ async def log_reply_usage(
         reply = Reply(
             user_id=user_id,  # NULL if not logged in
             service_type=reply_data.service_type,  # Just the platform key
-            tone_type=reply_data.tone_type  # The tone used for the reply
+            tone_type=reply_data.tone_type,  # The tone used for the reply
+            created_at=datetime.utcnow()
             # NO original_post, generated_reply, post_url, or metadata stored!
         )
         
         db.add(reply)
+        await record_reply_rollups(db, [(reply.created_at, reply.service_type, reply.tone_type)])
         await db.commit()
         await db.refresh(reply)
+        if user_id:
+            await track_active_users([(reply.created_at, str(user_id))])
         
         return ReplyResponse(
             id=str(reply.id),
@@ -81,23 +120,128 @@ async def log_reply_usage(
             detail=f"Failed to log reply usage: {str(e)}"
         )
 
+def clamp_event_timestamp(client_timestamp: Optional[datetime], now: datetime) -> datetime:
+    """Normalize a client timestamp to naive UTC inside the accepted ingestion window"""
+    if client_timestamp is None:
+        return now
+    if client_timestamp.tzinfo is not None:
+        client_timestamp = client_timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    if client_timestamp > now + timedelta(seconds=settings.replies_batch_max_clock_skew_seconds):
+        return now
+    oldest_allowed = now - timedelta(days=settings.replies_batch_max_event_age_days)
+    return max(client_timestamp, oldest_allowed)
+
+@router.post("/batch", response_model=ReplyBatchResponse)
+@invalidates(user_tag(REPLY_STATS_NAMESPACE))
+async def log_reply_usage_batch(
+    batch: ReplyBatchCreate,
+    current_user: Optional[Dict[str, Any]] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Log a batch of queued reply events - same privacy rules as POST /replies/
+    
+    Each event carries a client-generated `client_event_id`. Ids are claimed in
+    `reply_ingest_keys` and only unclaimed events are written, so a retried batch
+    is stored exactly once. All new events go out as a single multi-row INSERT
+    in one transaction. Ids are scoped per user, or per `client_id` for
+    anonymous batches, so unrelated clients' ids never collide.
+    """
+    if len(batch.events) > settings.replies_batch_max_events:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch too large: at most {settings.replies_batch_max_events} events per request"
+        )
+    if not current_user and not batch.client_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Anonymous batches need a client_id"
+        )
+    if not batch.events:
+        return ReplyBatchResponse(accepted=0, duplicates=0, accepted_event_ids=[])
+    
+    try:
+        user_id = None
+        if current_user:
+            user = await get_or_create_user(db, current_user)
+            user_id = user.id
+        scope = str(user_id) if user_id else f"anonymous:{batch.client_id}"
+        now = datetime.utcnow()
+        
+        # Repeats inside one batch count as duplicates too
+        events = {}
+        for event in batch.events:
+            events.setdefault(event.client_event_id, event)
+        
+        # Claim the ids; ON CONFLICT skips ones stored by an earlier attempt
+        claim_result = await db.execute(
+            pg_insert(ReplyIngestKey)
+            .values([
+                {"scope": scope, "client_event_id": event_id, "created_at": now}
+                for event_id in events
+            ])
+            .on_conflict_do_nothing(index_elements=[ReplyIngestKey.scope, ReplyIngestKey.client_event_id])
+            .returning(ReplyIngestKey.client_event_id)
+        )
+        claimed_ids = set(claim_result.scalars().all())
+        
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "service_type": event.service_type,
+                "tone_type": event.tone_type,
+                "created_at": clamp_event_timestamp(event.client_timestamp, now)
+            }
+            for event_id, event in events.items()
+            if event_id in claimed_ids
+        ]
+        if rows:
+            await db.execute(insert(Reply).values(rows))
+            await record_reply_rollups(
+                db, [(row["created_at"], row["service_type"], row["tone_type"]) for row in rows]
+            )
+        await db.commit()
+        if rows and user_id:
+            await track_active_users([(row["created_at"], str(user_id)) for row in rows])
+        
+        accepted_event_ids = [event_id for event_id in events if event_id in claimed_ids]
+        return ReplyBatchResponse(
+            accepted=len(accepted_event_ids),
+            duplicates=len(batch.events) - len(accepted_event_ids),
+            accepted_event_ids=accepted_event_ids
+        )
+        
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to log reply batch: {str(e)}"
+        )
+
 @router.get("/", response_model=List[ReplyResponse])
 async def get_user_reply_analytics(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     service_type: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None, description="Only replies created at or after this UTC time"),
+    until: Optional[datetime] = Query(None, description="Only replies created before this UTC time"),
     current_user: Dict[str, Any] = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get user's reply analytics (timestamps and service types only)"""
     try:
-        user = await get_or_create_user(db, current_user)
+        user = await get_or_create_user_for_read(db, current_user)
         
         # Build query - only return analytics data, no content
         query = select(Reply).where(Reply.user_id == user.id)
         
         if service_type:
             query = query.where(Reply.service_type == service_type)
+        # Bare created_at bounds let Postgres prune monthly partitions
+        if since:
+            query = query.where(Reply.created_at >= since)
+        if until:
+            query = query.where(Reply.created_at < until)
         
         query = query.order_by(desc(Reply.created_at)).offset(skip).limit(limit)
         
@@ -121,14 +265,19 @@ async def get_user_reply_analytics(
             detail=f"Failed to fetch reply analytics: {str(e)}"
         )
 
-@router.get("/stats", response_model=DashboardStats)
+@router.get(
+    "/stats", response_model=DashboardStats,
+    dependencies=[Depends(db_timeouts(statement_ms=STATS_STATEMENT_TIMEOUT_MS))]
+)
+# The day is part of the key because "today"/"week" windows roll over at midnight UTC
+@cache_route(ttl_seconds=300, tags=[user_tag(REPLY_STATS_NAMESPACE)], extra=utc_day)
 async def get_dashboard_stats(
     current_user: Dict[str, Any] = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get dashboard statistics"""
     try:
-        user = await get_or_create_user(db, current_user)
+        user = await get_or_create_user_for_read(db, current_user)
         
         now = datetime.utcnow()
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -165,30 +314,31 @@ async def get_dashboard_stats(
         )
         month_replies = month_result.scalar() or 0
         
-        # Daily activity (last 7 days)
-        daily_activity = []
-        for i in range(7):
-            day_start = today_start - timedelta(days=i)
-            day_end = day_start + timedelta(days=1)
-            
-            day_result = await db.execute(
-                select(func.count(Reply.id)).where(
-                    and_(
-                        Reply.user_id == user.id,
-                        Reply.created_at >= day_start,
-                        Reply.created_at < day_end
-                    )
+        # Daily activity (last 7 days) - one range-bounded query, so only the
+        # partitions covering the window are scanned
+        activity_start = today_start - timedelta(days=6)
+        day_bucket = func.date_trunc('day', Reply.created_at).label('day')
+        daily_result = await db.execute(
+            select(day_bucket, func.count(Reply.id))
+            .where(
+                and_(
+                    Reply.user_id == user.id,
+                    Reply.created_at >= activity_start,
+                    Reply.created_at < today_start + timedelta(days=1)
                 )
             )
-            count = day_result.scalar() or 0
-            
+            .group_by(day_bucket)
+        )
+        counts_by_day = {day.strftime("%Y-%m-%d"): count for day, count in daily_result}
+        
+        daily_activity = []
+        for i in range(7):  # Oldest to newest
+            day = (activity_start + timedelta(days=i)).strftime("%Y-%m-%d")
             daily_activity.append({
-                "date": day_start.strftime("%Y-%m-%d"),
-                "count": count
+                "date": day,
+                "count": counts_by_day.get(day, 0)
             })
         
-        daily_activity.reverse()  # Show oldest to newest
-        
         # Top services
         services_result = await db.execute(
             select(Reply.service_type, func.count(Reply.id).label('count'))
@@ -245,11 +395,11 @@ async def get_dashboard_stats(
 async def get_recent_activity(
     limit: int = Query(10, ge=1, le=50),
     current_user: Dict[str, Any] = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get recent reply activity (analytics only - no sensitive data)"""
     try:
-        user = await get_or_create_user(db, current_user)
+        user = await get_or_create_user_for_read(db, current_user)
         
         # Get recent reply analytics
         result = await db.execute(
@@ -288,7 +438,154 @@ async def get_recent_activity(
             detail=f"Failed to fetch recent activity: {str(e)}"
         )
 
+def encode_export_rows(rows, export_format: str) -> str:
+    """Serialize one cursor batch of (id, service_type, tone_type, created_at) rows"""
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for reply_id, service_type, tone_type, created_at in rows:
+            writer.writerow([str(reply_id), service_type, tone_type or "", created_at.isoformat()])
+        return buffer.getvalue()
+    return "".join(
+        json.dumps({
+            "id": str(reply_id),
+            "service_type": service_type,
+            "tone_type": tone_type,
+            "created_at": created_at.isoformat()
+        }) + "\n"
+        for reply_id, service_type, tone_type, created_at in rows
+    )
+
+async def gzip_chunks(chunks):
+    """Compress a text stream on the fly without buffering it"""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+# Long exports are bounded by the client instead: a disconnect cancels the stream
+@router.get("/export", dependencies=[Depends(db_timeouts(statement_ms=0))])
+async def export_reply_analytics(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    gzip: bool = Query(False, description="Compress the export as a .gz download"),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Export the user's full reply analytics history (data portability)
+    
+    Rows are read through a server-side cursor in batches of EXPORT_BATCH_SIZE
+    and streamed as they arrive, so memory stays flat however long the history is.
+    """
+    try:
+        user = await get_or_create_user(db, current_user)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to export reply analytics: {str(e)}"
+        )
+    
+    query = (
+        select(Reply.id, Reply.service_type, Reply.tone_type, Reply.created_at)
+        .where(Reply.user_id == user.id)
+        .order_by(Reply.created_at)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    
+    async def export_chunks():
+        if export_format == "csv":
+            yield ",".join(EXPORT_COLUMNS) + "\r\n"
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield encode_export_rows(rows, export_format)
+    
+    filename = f"humanreplies-replies.{export_format}"
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    body = export_chunks()
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+        body = gzip_chunks(body)
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/purge", response_model=PurgeJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def purge_reply_analytics_range(
+    purge_request: ReplyPurgeRequest,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete the user's reply analytics in a time range (runs in the background)
+    
+    Poll GET /replies/purge/{job_id} for progress.
+    """
+    if not purge_request.since and not purge_request.until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide since and/or until, or use POST /replies/purge/all"
+        )
+    if purge_request.since and purge_request.until and purge_request.since >= purge_request.until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since must be earlier than until"
+        )
+    try:
+        user = await get_or_create_user(db, current_user)
+        job = await create_purge_job(user.id, "range", purge_request.since, purge_request.until)
+        start_purge_job(job, user.id, current_user["id"])
+        return job
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to start reply analytics purge: {str(e)}"
+        )
+
+@router.post("/purge/all", response_model=PurgeJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def purge_all_reply_analytics(
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete the user's entire reply analytics history (runs in the background)"""
+    try:
+        user = await get_or_create_user(db, current_user)
+        job = await create_purge_job(user.id, "all")
+        start_purge_job(job, user.id, current_user["id"])
+        return job
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to start reply analytics purge: {str(e)}"
+        )
+
+@router.get("/purge/{job_id}", response_model=PurgeJobStatus)
+async def get_purge_job_status(
+    job_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Progress of a purge job started by the current user"""
+    try:
+        user = await get_or_create_user(db, current_user)
+        job = await get_job(job_id, user.id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch purge job: {str(e)}"
+        )
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Purge job not found"
+        )
+    return job
+
 @router.delete("/{reply_id}")
+@invalidates(user_tag(REPLY_STATS_NAMESPACE))
 async def delete_reply_analytics(
     reply_id: str,
     current_user: Dict[str, Any] = Depends(get_current_user),
@@ -326,20 +623,30 @@ async def delete_reply_analytics(
         )
 
 @router.get("/count")
-async def get_total_replies(db: AsyncSession = Depends(get_db)):
-    """Get total count of all replies in the system - cached for 5 minutes"""
+async def get_total_replies():
+    """Get total count of all replies in the system - cached for 5 minutes
+
+    Served stale-while-revalidate: once expired, the old count is returned for up
+    to another 5 minutes while a single background task recounts.
+    """
     try:
         cache_key = "total_replies_count"
         
         async def load_total_count():
-            result = await db.execute(select(func.count(Reply.id)))
-            return result.scalar() or 0
+            # Own session: a background refresh outlives the request. A global
+            # count needs no read-your-writes pin, so the replica is fine
+            target, reason = await read_target()
+            read_sessions.inc(target=target, reason=reason)
+            async with read_session_factory(target)() as session:
+                result = await session.execute(select(func.count(Reply.id)))
+                return result.scalar() or 0
         
         # Use Redis cache with 5 minute (300 seconds) TTL
         total_count, was_cached = await redis_cache.cached(
             cache_key, 
             300,  # 5 minutes
-            load_total_count
+            load_total_count,
+            stale_ttl_seconds=300
         )
         
         return {
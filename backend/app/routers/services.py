@@ -1,15 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from app.models import ExternalServiceUrl, ServiceUrlsResponse, ExternalServiceUrlResponse, GenerateReplyRequest, GenerateReplyResponse, Reply, User, Tone
-from app.database import get_db
+from sqlalchemy import select
+from app.models import ExternalServiceUrl, ServiceUrlsResponse, ExternalServiceUrlResponse, GenerateReplyRequest, GenerateReplyResponse, Reply, User
+from app.database import detached_session, get_db
 from app.auth import get_current_user, get_optional_user
+from app.rollups import record_reply_rollups, track_active_users
+from app.cache import redis_cache
+from app.settings_cache import get_user_prompt_settings, writing_style_instruction
+from app.routers.tones import resolve_tone
+from app.http_cache import bump_user_data_version, SERVICE_URLS_NAMESPACE, REPLY_STATS_NAMESPACE, PUBLIC_SHORT
+from app.route_cache import cache_route
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 import httpx
 import asyncio
 import logging
-import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +23,27 @@ router = APIRouter(prefix="/services", tags=["External Services"])
 # Cache duration for URLs (1 hour as requested)
 CACHE_DURATION_HOURS = 1
 
+# Supported external services and their default URLs
+DEFAULT_SERVICE_URLS = {
+    "pollinations": "https://text.pollinations.ai"
+}
+
+async def service_exists(db: AsyncSession, service_name: str) -> bool:
+    """Whether a service row exists; cached, and misses are cached as negatives."""
+    (version,) = await redis_cache.get_versions(SERVICE_URLS_NAMESPACE)
+
+    async def load():
+        async with detached_session(db) as session:
+            result = await session.execute(
+                select(ExternalServiceUrl.id).where(ExternalServiceUrl.service_name == service_name)
+            )
+            return True if result.scalar_one_or_none() else None
+
+    exists, _ = await redis_cache.cached(
+        f"{SERVICE_URLS_NAMESPACE}:v{version}:exists:{service_name}", CACHE_DURATION_HOURS * 3600, load
+    )
+    return bool(exists)
+
 async def get_or_create_user(db: AsyncSession, supabase_user: Dict[str, Any]) -> User:
     """Get existing user or create new one"""
     # Check if user exists
@@ -40,64 +66,27 @@ async def get_or_create_user(db: AsyncSession, supabase_user: Dict[str, Any]) ->
     
     return user
 
-async def determine_tone_type(db: AsyncSession, tone_name: str, user_id: Optional[str] = None) -> str:
-    """Determine if a tone is a preset or custom tone"""
-    if not tone_name:
-        return "unknown"
-    
-    # Check if it's a system preset
-    result = await db.execute(
-        select(Tone).where(and_(Tone.name == tone_name, Tone.is_preset == True))
-    )
-    preset_tone = result.scalar_one_or_none()
-    
-    if preset_tone:
-        return tone_name  # Return the preset tone name
-    
-    # If user is provided, check if it's their custom tone
-    if user_id:
-        try:
-            # Convert string to UUID if needed
-            if isinstance(user_id, str):
-                user_uuid = uuid.UUID(user_id)
-            else:
-                user_uuid = user_id
-                
-            result = await db.execute(
-                select(Tone).where(and_(
-                    Tone.name == tone_name, 
-                    Tone.is_preset == False,
-                    Tone.user_id == user_uuid
-                ))
-            )
-            custom_tone = result.scalar_one_or_none()
-            
-            if custom_tone:
-                return "custom"  # It's a user's custom tone
-        except Exception:
-            pass
-    
-    # If we can't find it, it might be a preset tone name that we just don't have in DB yet
-    # Common preset tone names
-    preset_names = ["helpful", "friendly", "professional", "casual", "encouraging", "humorous", "informative", "neutral"]
-    if tone_name.lower() in preset_names:
-        return tone_name.lower()
-    
-    return "unknown"
-
 async def log_reply_usage(db: AsyncSession, platform: str, tone_type: str, user: Optional[User] = None):
     """Log reply usage for analytics"""
     try:
         reply = Reply(
             user_id=user.id if user else None,
             service_type=platform,
-            tone_type=tone_type
+            tone_type=tone_type,
+            created_at=datetime.utcnow()
         )
         db.add(reply)
+        await record_reply_rollups(db, [(reply.created_at, platform, tone_type)])
         await db.commit()
     except Exception as e:
         logger.warning(f"Failed to log reply usage: {e}")
         # Don't fail the main request if logging fails
+        return
+    if user:
+        # Outside the try above: the reply is stored, so the stats must move on
+        # even if this (best-effort, self-guarding) bookkeeping misbehaves
+        await bump_user_data_version(REPLY_STATS_NAMESPACE, user.supabase_user_id)
+        await track_active_users([(reply.created_at, str(user.id))])
 
 async def get_or_update_service_url(db: AsyncSession, service_name: str, default_url: str) -> ExternalServiceUrl:
     """Get service URL from database or create/update if needed"""
@@ -136,16 +125,27 @@ async def get_or_update_service_url(db: AsyncSession, service_name: str, default
         
         await db.commit()
         await db.refresh(service_url)
+        await redis_cache.bump_version(SERVICE_URLS_NAMESPACE)
         
         logger.info(f"Updated {service_name} URL: {url_to_use}")
     
     return service_url
 
 @router.get("/urls", response_model=ServiceUrlsResponse)
+@cache_route(
+    ttl_seconds=300, tags=[SERVICE_URLS_NAMESPACE], vary=(), cache_control=PUBLIC_SHORT,
+    expires=lambda urls: urls.cache_expires_at
+)
 async def get_service_urls(
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all external service URLs (cached for 1 hour)"""
+    """Get all external service URLs (cached for 1 hour)
+    
+    Clients may cache the response until `cache_expires_at` (Cache-Control max-age)
+    and revalidate with If-None-Match afterwards. A cached response is never
+    served past `cache_expires_at`; the reload refreshes the row, and that
+    bumps the services:urls tag.
+    """
     try:
         # Get pollinations URL
         pollinations_service = await get_or_update_service_url(
@@ -174,12 +174,7 @@ async def get_service_url(
 ):
     """Get specific service URL"""
     try:
-        # Map service names to default URLs
-        default_urls = {
-            "pollinations": "https://text.pollinations.ai"
-        }
-        
-        if service_name not in default_urls:
+        if service_name not in DEFAULT_SERVICE_URLS:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Service '{service_name}' not supported"
@@ -188,7 +183,7 @@ async def get_service_url(
         service_url = await get_or_update_service_url(
             db, 
             service_name, 
-            default_urls[service_name]
+            DEFAULT_SERVICE_URLS[service_name]
         )
         
         return ExternalServiceUrlResponse(
@@ -215,6 +210,13 @@ async def refresh_service_url(
 ):
     """Force refresh a service URL (admin function)"""
     try:
+        # Unknown names are answered from the negative cache, not Postgres
+        if not await service_exists(db, service_name):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Service '{service_name}' not found"
+            )
+        
         # Find existing record
         result = await db.execute(
             select(ExternalServiceUrl).where(ExternalServiceUrl.service_name == service_name)
@@ -232,14 +234,10 @@ async def refresh_service_url(
         await db.commit()
         
         # Get updated URL
-        default_urls = {
-            "pollinations": "https://text.pollinations.ai"
-        }
-        
         updated_service = await get_or_update_service_url(
             db, 
             service_name, 
-            default_urls.get(service_name, service_url.url)
+            DEFAULT_SERVICE_URLS.get(service_name, service_url.url)
         )
         
         return {
@@ -280,42 +278,18 @@ async def generate_reply(
         
         # Get user if authenticated
         user = None
-        user_settings = None
+        settings_fragments = None
         if current_user:
             user = await get_or_create_user(db, current_user)
-            # Get user settings if they exist
-            from app.models import UserSettings
-            result = await db.execute(
-                select(UserSettings).where(UserSettings.user_id == user.id)
-            )
-            user_settings = result.scalar_one_or_none()
+            # Cached settings with pre-rendered prompt fragments (no query on a hit)
+            prompt_settings = await get_user_prompt_settings(db, current_user["id"])
+            settings_fragments = prompt_settings["fragments"]
         
-        # Try to fetch preset tone first
-        tone_obj = None
+        # Preset first, then the user's custom tones; cached, including unknown names
+        tone_obj = await resolve_tone(db, request.tone, current_user["id"] if current_user else None)
         tone_type = "unknown"
-        result = await db.execute(
-            select(Tone).where(and_(Tone.name == request.tone, Tone.is_preset == True))
-        )
-        preset_tone = result.scalar_one_or_none()
-        if preset_tone:
-            tone_obj = preset_tone
-            tone_type = request.tone
-        elif user:
-            try:
-                user_uuid = user.id if not isinstance(user.id, str) else uuid.UUID(user.id)
-                result = await db.execute(
-                    select(Tone).where(and_(
-                        Tone.name == request.tone,
-                        Tone.is_preset == False,
-                        Tone.user_id == user_uuid
-                    ))
-                )
-                custom_tone = result.scalar_one_or_none()
-                if custom_tone:
-                    tone_obj = custom_tone
-                    tone_type = "custom"
-            except Exception:
-                pass
+        if tone_obj:
+            tone_type = request.tone if tone_obj["is_preset"] else "custom"
 
         # If no matching tone, fallback to no tone
         prompt = build_prompt(request.context, {
@@ -323,7 +297,7 @@ async def generate_reply(
             "platform": request.platform,
             "length": request.length,
             "user_writing_style": request.user_writing_style,
-            "user_settings": user_settings,
+            "settings_fragments": settings_fragments,
             "is_improve_mode": request.is_improve_mode
         })
 
@@ -358,7 +332,7 @@ def build_prompt(context: str, options: Dict[str, Any]) -> str:
     platform = options.get("platform", "social media")
     length = options.get("length", "medium")
     user_writing_style = options.get("user_writing_style")
-    user_settings = options.get("user_settings")
+    settings_fragments = options.get("settings_fragments") or {}
     is_improve_mode = options.get("is_improve_mode", False)
 
     p = str(platform).lower()
@@ -380,11 +354,11 @@ def build_prompt(context: str, options: Dict[str, Any]) -> str:
 
     platform_instructions = length_instructions.get(length, length_instructions['medium'])
 
-    # Use tone_obj's instruction/description if available
-    if tone_obj and hasattr(tone_obj, "instruction") and tone_obj.instruction:
-        tone_instruction = tone_obj.instruction
-    elif tone_obj and hasattr(tone_obj, "description") and tone_obj.description:
-        tone_instruction = tone_obj.description
+    # Use the tone's instruction/description if available (tone_obj is a cached tone dict)
+    if tone_obj and tone_obj.get("instruction"):
+        tone_instruction = tone_obj["instruction"]
+    elif tone_obj and tone_obj.get("description"):
+        tone_instruction = tone_obj["description"]
     else:
         # Default instruction based on mode
         if is_improve_mode:
@@ -392,17 +366,11 @@ def build_prompt(context: str, options: Dict[str, Any]) -> str:
         else:
             tone_instruction = "Reply"  # Default for reply mode
 
-    # Add user's custom writing style if provided
-    custom_writing_instructions = ""
-    if user_settings and hasattr(user_settings, "writing_style") and user_settings.writing_style:
-        custom_writing_instructions = f"Important: Follow this custom writing style: {user_settings.writing_style}. "
-    elif user_writing_style:
-        custom_writing_instructions = f"Important: Follow this custom writing style: {user_writing_style}. "
+    # Add user's custom writing style if provided (saved settings win over the request)
+    custom_writing_instructions = settings_fragments.get("writing_style") or writing_style_instruction(user_writing_style)
 
     # Add guardian text (what NOT to do) if provided
-    guardian_instructions = ""
-    if user_settings and hasattr(user_settings, "guardian_text") and user_settings.guardian_text:
-        guardian_instructions = f"IMPORTANT - Do NOT: {user_settings.guardian_text}. "
+    guardian_instructions = settings_fragments.get("guardian", "")
 
     # No dash rule
     no_dash_rule = (
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_
 from app.models import Tone, ToneResponse, TonesListResponse, ToneCreateRequest, User
-from app.database import get_db
+from app.database import detached_session, get_db
 from app.auth import get_optional_user, get_current_user
+from app.replica import get_read_db
 from typing import List, Optional, Dict, Any
 from app.cache import redis_cache
+from app.http_cache import data_etag, etag_matches, not_modified, set_cache_headers, PRIVATE_REVALIDATE, PUBLIC_SHORT
+from app.route_cache import cache_route, invalidates, user_tag, encoded_response, render_json
 import logging
 import re
 
@@ -13,80 +16,206 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/tones", tags=["Tones"])
 
-async def invalidate_tone_caches(user_supabase_id: str):
-    """Invalidate relevant Redis tone caches after mutation."""
+PRESET_TONES_NAMESPACE = "tones:presets"
+USER_TONES_NAMESPACE = "tones:user"
+# Per-name lookups live under their own prefix so they don't crowd the list entries in L1
+TONE_NAME_PREFIX = "tones:name"
+TONES_CACHE_TTL = 300  # 5 minutes
+
+def user_tones_namespace(user_supabase_id: str) -> str:
+    return f"{USER_TONES_NAMESPACE}:{user_supabase_id}"
+
+async def invalidate_preset_tone_cache():
+    """Move the preset generation forward after presets change (e.g. setup_tones.py)."""
     try:
-        # Best-effort; ignore if Redis disabled
-        await redis_cache.set_json("tones:presets", None, 1)  # force expire
-        await redis_cache.set_json(f"tones:user:{user_supabase_id}", None, 1)
+        await redis_cache.bump_version(PRESET_TONES_NAMESPACE)
     except Exception:
         pass
 
+def tone_to_dict(tone: Tone) -> Dict[str, Any]:
+    return dict(
+        id=str(tone.id),
+        name=tone.name,
+        display_name=tone.display_name,
+        description=tone.description,
+        is_preset=tone.is_preset,
+        is_active=tone.is_active,
+        sort_order=tone.sort_order,
+        user_id=str(tone.user_id) if tone.user_id else None
+    )
+
+def tone_response_dict(tone: Tone) -> Dict[str, Any]:
+    """tone_to_dict validated as a ToneResponse. List entries are cached in this
+    form and rendered to JSON directly, so they must already match the response model."""
+    return ToneResponse.model_validate(tone_to_dict(tone)).model_dump(mode="json")
+
+def tone_sort_key(tone: Dict[str, Any]):
+    # Same order as ORDER BY sort_order, name (NULL sort_order last)
+    return (tone["sort_order"] is None, tone["sort_order"] or 0, tone["name"])
+
+async def load_preset_tones(db: AsyncSession) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        select(Tone)
+        .where(and_(
+            Tone.is_active == True,
+            Tone.is_preset == True,
+            Tone.name != "ask"  # Exclude "ask" tone - handled by frontend
+        ))
+        .order_by(Tone.sort_order, Tone.name)
+    )
+    return [tone_response_dict(tone) for tone in result.scalars().all()]
+
+async def load_custom_tones(db: AsyncSession, user_supabase_id: str) -> List[Dict[str, Any]]:
+    user_result = await db.execute(
+        select(User).where(User.supabase_user_id == user_supabase_id)
+    )
+    user = user_result.scalar_one_or_none()
+    if not user:
+        return []
+    result = await db.execute(
+        select(Tone)
+        .where(and_(
+            Tone.is_active == True,
+            Tone.is_preset == False,
+            Tone.name != "ask",
+            Tone.user_id == user.id
+        ))
+        .order_by(Tone.sort_order, Tone.name)
+    )
+    return [tone_response_dict(tone) for tone in result.scalars().all()]
+
+async def load_preset_tones_detached(db: AsyncSession) -> List[Dict[str, Any]]:
+    """load_preset_tones for cache loaders, on a session of its own."""
+    async with detached_session(db) as session:
+        return await load_preset_tones(session)
+
+async def get_cached_preset_tones(db: AsyncSession) -> List[Dict[str, Any]]:
+    (preset_version,) = await redis_cache.get_versions(PRESET_TONES_NAMESPACE)
+    presets, _ = await redis_cache.cached(
+        f"{PRESET_TONES_NAMESPACE}:v{preset_version}",
+        TONES_CACHE_TTL,
+        lambda: load_preset_tones_detached(db)
+    )
+    return presets
+
+async def resolve_tone(
+    db: AsyncSession, tone_name: str, user_supabase_id: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Look a tone up by name: presets first, then the user's custom tones.
+
+    Each (generation, name) lookup is cached, including misses (as negatives
+    with a short TTL), so unknown names don't query Postgres on every request.
+    Creating a tone bumps the generation, which retires any cached miss for it.
+    """
+    if not tone_name:
+        return None
+    namespaces = [PRESET_TONES_NAMESPACE]
+    if user_supabase_id:
+        namespaces.append(user_tones_namespace(user_supabase_id))
+    versions = await redis_cache.get_versions(*namespaces)
+
+    async def load_preset():
+        async with detached_session(db) as session:
+            result = await session.execute(
+                select(Tone).where(and_(Tone.name == tone_name, Tone.is_preset == True))
+            )
+            tone = result.scalars().first()
+            return tone_to_dict(tone) if tone else None
+
+    tone, _ = await redis_cache.cached(
+        f"{TONE_NAME_PREFIX}:presets:v{versions[0]}:{tone_name}", TONES_CACHE_TTL, load_preset
+    )
+    if tone or not user_supabase_id:
+        return tone
+
+    async def load_custom():
+        async with detached_session(db) as session:
+            result = await session.execute(
+                select(Tone)
+                .join(User, User.id == Tone.user_id)
+                .where(and_(
+                    Tone.name == tone_name,
+                    Tone.is_preset == False,
+                    User.supabase_user_id == user_supabase_id
+                ))
+            )
+            tone = result.scalars().first()
+            return tone_to_dict(tone) if tone else None
+
+    tone, _ = await redis_cache.cached(
+        f"{TONE_NAME_PREFIX}:user:{user_supabase_id}:v{versions[1]}:{tone_name}", TONES_CACHE_TTL, load_custom
+    )
+    return tone
+
+async def load_preset_list(db: AsyncSession) -> Dict[str, Any]:
+    # Runs as a cache loader itself, so the nested preset load gets its own session too
+    return {"tones": await get_cached_preset_tones(db)}
+
+async def get_user_tones_response(db: AsyncSession, user_supabase_id: str) -> Response:
+    """Presets merged with one user's custom tones, rendered straight to JSON."""
+    user_namespace = user_tones_namespace(user_supabase_id)
+    user_version, preset_version = await redis_cache.get_versions(user_namespace, PRESET_TONES_NAMESPACE)
+    preset_key = f"{PRESET_TONES_NAMESPACE}:v{preset_version}"
+    custom_key = f"{user_namespace}:v{user_version}"
+
+    cached = await redis_cache.get_many([preset_key, custom_key])
+    presets = cached.get(preset_key)
+    if presets is None:
+        presets, _ = await redis_cache.cached(preset_key, TONES_CACHE_TTL, lambda: load_preset_tones_detached(db))
+    custom_tones = cached.get(custom_key)
+    if custom_tones is None:
+        custom_tones = await load_custom_tones(db, user_supabase_id)
+        await redis_cache.set_json(custom_key, custom_tones, TONES_CACHE_TTL, publish=False)
+
+    # Entries were validated as ToneResponse when cached (tone_response_dict)
+    body = render_json({"tones": sorted(presets + custom_tones, key=tone_sort_key)})
+    return Response(content=body, media_type="application/json")
+
 @router.get("/", response_model=TonesListResponse)
 async def get_tones(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
     current_user: Optional[Dict[str, Any]] = Depends(get_optional_user)
 ):
     """Get all active tones (presets + user's custom tones if authenticated)
 
-    Caching strategy:
-    - Preset-only results cached under key: tones:presets
-    - Authenticated user results cached under key: tones:user:<supabase_user_id>
+    Caching strategy (generation-counter keys, see RedisCache.bump_version):
+    - One shared preset entry: tones:presets:v<n>
+    - One small custom-tone entry per user: tones:user:<supabase_user_id>:v<m>
+    - Both are fetched with a single MGET and merged at read time, so Redis memory
+      grows with custom tones, not users x presets, and a preset change is
+      visible to every user immediately.
     - TTL: 300 seconds (5 minutes)
-    - Custom tone mutations (create/update/delete) will invalidate user + presets cache.
+    - Custom tone mutations (create/update/delete) bump only that user's generation.
+
+    The same generation counters drive the ETag, so an unchanged list is a 304
+    without touching Postgres. Cached entries are validated as ToneResponse
+    when they are loaded, so responses are written as JSON bytes directly
+    without per-request validation; the anonymous list is cached pre-encoded
+    and pre-compressed.
     """
+    namespaces = [PRESET_TONES_NAMESPACE]
+    cache_control = PUBLIC_SHORT
+    if current_user:
+        namespaces.append(user_tones_namespace(current_user["id"]))
+        cache_control = PRIVATE_REVALIDATE
+    etag = await data_etag(namespaces)
+    # Same URL serves anonymous and per-user lists
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control, vary="Authorization")
+
     try:
-        cache_key: Optional[str] = None
         if current_user:
-            cache_key = f"tones:user:{current_user['id']}"
+            response = await get_user_tones_response(db, current_user["id"])
         else:
-            cache_key = "tones:presets"
-
-        async def load_tones():
-            # Base query for preset tones (excluding "ask")
-            query = select(Tone).where(
-                and_(
-                    Tone.is_active == True,
-                    Tone.is_preset == True,
-                    Tone.name != "ask"
-                )
+            (preset_version,) = await redis_cache.get_versions(PRESET_TONES_NAMESPACE)
+            response, _ = await encoded_response(
+                request, f"{PRESET_TONES_NAMESPACE}:body:v{preset_version}", TONES_CACHE_TTL,
+                lambda: load_preset_list(db)
             )
-            if current_user:
-                user_result = await db.execute(
-                    select(User).where(User.supabase_user_id == current_user["id"])
-                )
-                user = user_result.scalar_one_or_none()
-                if user:
-                    query = select(Tone).where(
-                        and_(
-                            Tone.is_active == True,
-                            Tone.name != "ask",
-                            or_(
-                                Tone.is_preset == True,
-                                Tone.user_id == user.id
-                            )
-                        )
-                    )
-            result = await db.execute(query.order_by(Tone.sort_order, Tone.name))
-            tones = result.scalars().all()
-            tone_responses = [
-                dict(
-                    id=str(tone.id),
-                    name=tone.name,
-                    display_name=tone.display_name,
-                    description=tone.description,
-                    is_preset=tone.is_preset,
-                    is_active=tone.is_active,
-                    sort_order=tone.sort_order,
-                    user_id=str(tone.user_id) if tone.user_id else None
-                )
-                for tone in tones
-            ]
-            return {"tones": tone_responses}
-
-        data, from_cache = await redis_cache.cached(cache_key, 300, load_tones)
-        # Convert dicts back into response model objects automatically by FastAPI
-        return TonesListResponse(**data)
+        set_cache_headers(response, etag, cache_control)
+        response.headers.add_vary_header("Authorization")
+        return response
     except Exception as e:
         logger.error(f"Failed to get tones: {str(e)}")
         raise HTTPException(
@@ -95,37 +224,11 @@ async def get_tones(
         )
 
 @router.get("/presets", response_model=TonesListResponse)
-async def get_preset_tones(
-    db: AsyncSession = Depends(get_db)
-):
-    """Get only preset tones"""
+@cache_route(ttl_seconds=TONES_CACHE_TTL, tags=[PRESET_TONES_NAMESPACE], vary=(), cache_control=PUBLIC_SHORT)
+async def get_preset_tones(db: AsyncSession = Depends(get_read_db)):
+    """Get only preset tones (one response shared by every caller)"""
     try:
-        result = await db.execute(
-            select(Tone)
-            .where(and_(
-                Tone.is_active == True, 
-                Tone.is_preset == True,
-                Tone.name != "ask"  # Exclude "ask" tone - handled by frontend
-            ))
-            .order_by(Tone.sort_order, Tone.name)
-        )
-        tones = result.scalars().all()
-        
-        tone_responses = [
-            ToneResponse(
-                id=str(tone.id),
-                name=tone.name,
-                display_name=tone.display_name,
-                description=tone.description,
-                is_preset=tone.is_preset,
-                is_active=tone.is_active,
-                sort_order=tone.sort_order,
-                user_id=None
-            )
-            for tone in tones
-        ]
-        
-        return TonesListResponse(tones=tone_responses)
+        return TonesListResponse(tones=await get_cached_preset_tones(db))
         
     except Exception as e:
         logger.error(f"Failed to get preset tones: {str(e)}")
@@ -135,6 +238,7 @@ async def get_preset_tones(
         )
 
 @router.post("/", response_model=ToneResponse)
+@invalidates(user_tag(USER_TONES_NAMESPACE))
 async def create_custom_tone(
     tone_data: ToneCreateRequest,
     db: AsyncSession = Depends(get_db),
@@ -195,8 +299,6 @@ async def create_custom_tone(
         await db.commit()
         await db.refresh(new_tone)
         
-        # Invalidate caches
-        await invalidate_tone_caches(current_user["id"])
         return ToneResponse(
             id=str(new_tone.id),
             name=new_tone.name,
@@ -218,6 +320,7 @@ async def create_custom_tone(
         )
 
 @router.put("/{tone_id}", response_model=ToneResponse)
+@invalidates(user_tag(USER_TONES_NAMESPACE))
 async def update_custom_tone(
     tone_id: str,
     tone_data: ToneCreateRequest,
@@ -293,8 +396,6 @@ async def update_custom_tone(
         await db.commit()
         await db.refresh(tone)
         
-        # Invalidate caches
-        await invalidate_tone_caches(current_user["id"])
         return ToneResponse(
             id=str(tone.id),
             name=tone.name,
@@ -316,6 +417,7 @@ async def update_custom_tone(
         )
 
 @router.delete("/{tone_id}")
+@invalidates(user_tag(USER_TONES_NAMESPACE))
 async def delete_custom_tone(
     tone_id: str,
     db: AsyncSession = Depends(get_db),
@@ -358,8 +460,6 @@ async def delete_custom_tone(
         await db.delete(tone)
         await db.commit()
         
-        # Invalidate caches
-        await invalidate_tone_caches(current_user["id"])
         return {"success": True, "message": "Tone deleted successfully"}
     except HTTPException:
         raise
@@ -1,61 +1,98 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, literal, func, cast
+from sqlalchemy.dialects.postgresql import insert as pg_insert, UUID as PGUUID
+from sqlalchemy.types import DateTime, Text
 from app.database import get_db
 from app.models import UserSettings, UserSettingsResponse, UserSettingsCreateRequest, UserSettingsUpdateRequest
 from app.auth import get_current_user
 from app.models import User
+from app.settings_cache import write_through_user_settings
+from app.http_cache import USER_SETTINGS_NAMESPACE
+from app.route_cache import cache_route, invalidates, user_tag
 import uuid
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, Optional
 
 router = APIRouter(prefix="/user-settings", tags=["user-settings"])
 
+SETTINGS_COLUMNS = (
+    UserSettings.id, UserSettings.user_id, UserSettings.writing_style,
+    UserSettings.guardian_text, UserSettings.created_at, UserSettings.updated_at
+)
+
+def settings_response(settings) -> UserSettingsResponse:
+    return UserSettingsResponse(
+        id=str(settings.id),
+        user_id=str(settings.user_id),
+        writing_style=settings.writing_style,
+        guardian_text=settings.guardian_text,
+        created_at=settings.created_at,
+        updated_at=settings.updated_at
+    )
+
+def settings_insert(user_supabase_id: str, writing_style: Optional[str], guardian_text: Optional[str]):
+    """INSERT ... SELECT from users, so the user lookup rides along in the same statement
+
+    Parameters are cast explicitly: in a SELECT list Postgres would otherwise type them as text.
+    """
+    now = datetime.utcnow()
+    source = select(
+        literal(uuid.uuid4(), PGUUID(as_uuid=True)),
+        User.id,
+        cast(literal(writing_style, Text), Text),
+        cast(literal(guardian_text, Text), Text),
+        cast(literal(now, DateTime), DateTime),
+        cast(literal(now, DateTime), DateTime)
+    ).where(User.supabase_user_id == user_supabase_id)
+    return pg_insert(UserSettings).from_select(
+        ["id", "user_id", "writing_style", "guardian_text", "created_at", "updated_at"], source
+    )
+
+async def user_exists(db: AsyncSession, user_supabase_id: str) -> bool:
+    result = await db.execute(select(User.id).where(User.supabase_user_id == user_supabase_id))
+    return result.scalar_one_or_none() is not None
+
 @router.get("/", response_model=UserSettingsResponse)
+@cache_route(ttl_seconds=300, tags=[user_tag(USER_SETTINGS_NAMESPACE)])
 async def get_user_settings(
     current_user: Dict[str, Any] = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get current user's settings"""
+    """Get current user's settings
+
+    Users who never saved settings get a virtual default; nothing is written on read.
+    """
     try:
-        # Get user from database using supabase user ID
-        user_result = await db.execute(
-            select(User).where(User.supabase_user_id == current_user["id"])
+        result = await db.execute(
+            select(User.id, User.created_at, UserSettings)
+            .outerjoin(UserSettings, UserSettings.user_id == User.id)
+            .where(User.supabase_user_id == current_user["id"])
         )
-        user = user_result.scalar_one_or_none()
+        row = result.one_or_none()
         
-        if not user:
+        if not row:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
         
-        user_uuid = user.id
-        
-        result = await db.execute(
-            select(UserSettings).where(UserSettings.user_id == user_uuid)
-        )
-        settings = result.scalar_one_or_none()
-        
-        if not settings:
-            # Create default settings if none exist
-            settings = UserSettings(
-                user_id=user_uuid,
-                writing_style=None,
-                guardian_text=None
-            )
-            db.add(settings)
-            await db.commit()
-            await db.refresh(settings)
+        user_uuid, user_created_at, settings = row
+        if settings:
+            return settings_response(settings)
         
+        created_at = user_created_at or datetime.utcnow()
         return UserSettingsResponse(
-            id=str(settings.id),
-            user_id=str(settings.user_id),
-            writing_style=settings.writing_style,
-            guardian_text=settings.guardian_text,
-            created_at=settings.created_at,
-            updated_at=settings.updated_at
+            id=str(uuid.uuid5(user_uuid, "user_settings")),
+            user_id=str(user_uuid),
+            writing_style=None,
+            guardian_text=None,
+            created_at=created_at,
+            updated_at=created_at
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -63,6 +100,7 @@ async def get_user_settings(
         )
 
 @router.post("/", response_model=UserSettingsResponse)
+@invalidates(user_tag(USER_SETTINGS_NAMESPACE))
 async def create_user_settings(
     settings_request: UserSettingsCreateRequest,
     current_user: Dict[str, Any] = Depends(get_current_user),
@@ -70,51 +108,32 @@ async def create_user_settings(
 ):
     """Create user settings (only if none exist)"""
     try:
-        # Get user from database using supabase user ID
-        user_result = await db.execute(
-            select(User).where(User.supabase_user_id == current_user["id"])
+        statement = settings_insert(
+            current_user["id"], settings_request.writing_style, settings_request.guardian_text
         )
-        user = user_result.scalar_one_or_none()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        
-        user_uuid = user.id
-        
-        # Check if settings already exist
         result = await db.execute(
-            select(UserSettings).where(UserSettings.user_id == user_uuid)
+            statement.on_conflict_do_nothing(index_elements=[UserSettings.user_id])
+            .returning(*SETTINGS_COLUMNS)
         )
-        existing_settings = result.scalar_one_or_none()
+        settings = result.one_or_none()
         
-        if existing_settings:
+        if not settings:
+            # Nothing inserted: either no such user or a row already exists
+            await db.rollback()
+            if not await user_exists(db, current_user["id"]):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="User not found"
+                )
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="User settings already exist. Use PUT to update."
             )
         
-        # Create new settings
-        settings = UserSettings(
-            user_id=user_uuid,
-            writing_style=settings_request.writing_style,
-            guardian_text=settings_request.guardian_text
-        )
-        
-        db.add(settings)
         await db.commit()
-        await db.refresh(settings)
+        await write_through_user_settings(current_user["id"], settings)
         
-        return UserSettingsResponse(
-            id=str(settings.id),
-            user_id=str(settings.user_id),
-            writing_style=settings.writing_style,
-            guardian_text=settings.guardian_text,
-            created_at=settings.created_at,
-            updated_at=settings.updated_at
-        )
+        return settings_response(settings)
         
     except HTTPException:
         raise
@@ -126,59 +145,43 @@ async def create_user_settings(
         )
 
 @router.put("/", response_model=UserSettingsResponse)
+@invalidates(user_tag(USER_SETTINGS_NAMESPACE))
 async def update_user_settings(
     settings_request: UserSettingsUpdateRequest,
     current_user: Dict[str, Any] = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Update user settings"""
+    """Update user settings (created if missing; omitted fields keep their value)"""
     try:
-        # Get user from database using supabase user ID
-        user_result = await db.execute(
-            select(User).where(User.supabase_user_id == current_user["id"])
+        statement = settings_insert(
+            current_user["id"], settings_request.writing_style, settings_request.guardian_text
         )
-        user = user_result.scalar_one_or_none()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        
-        user_uuid = user.id
-        
         result = await db.execute(
-            select(UserSettings).where(UserSettings.user_id == user_uuid)
+            statement.on_conflict_do_update(
+                index_elements=[UserSettings.user_id],
+                set_={
+                    "writing_style": func.coalesce(statement.excluded.writing_style, UserSettings.writing_style),
+                    "guardian_text": func.coalesce(statement.excluded.guardian_text, UserSettings.guardian_text),
+                    "updated_at": statement.excluded.updated_at
+                }
+            ).returning(*SETTINGS_COLUMNS)
         )
-        settings = result.scalar_one_or_none()
+        settings = result.one_or_none()
         
         if not settings:
-            # Create settings if they don't exist
-            settings = UserSettings(
-                user_id=user_uuid,
-                writing_style=settings_request.writing_style,
-                guardian_text=settings_request.guardian_text
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
             )
-            db.add(settings)
-        else:
-            # Update existing settings
-            if settings_request.writing_style is not None:
-                settings.writing_style = settings_request.writing_style
-            if settings_request.guardian_text is not None:
-                settings.guardian_text = settings_request.guardian_text
         
         await db.commit()
-        await db.refresh(settings)
+        await write_through_user_settings(current_user["id"], settings)
         
-        return UserSettingsResponse(
-            id=str(settings.id),
-            user_id=str(settings.user_id),
-            writing_style=settings.writing_style,
-            guardian_text=settings.guardian_text,
-            created_at=settings.created_at,
-            updated_at=settings.updated_at
-        )
+        return settings_response(settings)
         
+    except HTTPException:
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(
@@ -187,34 +190,21 @@ async def update_user_settings(
         )
 
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
+@invalidates(user_tag(USER_SETTINGS_NAMESPACE))
 async def delete_user_settings(
     current_user: Dict[str, Any] = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Delete user settings (reset to defaults)"""
     try:
-        # Get user from database using supabase user ID
-        user_result = await db.execute(
-            select(User).where(User.supabase_user_id == current_user["id"])
+        await db.execute(
+            delete(UserSettings)
+            .where(UserSettings.user_id == select(User.id).where(
+                User.supabase_user_id == current_user["id"]
+            ).scalar_subquery())
         )
-        user = user_result.scalar_one_or_none()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        
-        user_uuid = user.id
-        
-        result = await db.execute(
-            select(UserSettings).where(UserSettings.user_id == user_uuid)
-        )
-        settings = result.scalar_one_or_none()
-        
-        if settings:
-            await db.delete(settings)
-            await db.commit()
+        await db.commit()
+        await write_through_user_settings(current_user["id"], None)
         
         return None
         
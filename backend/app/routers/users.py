@@ -4,6 +4,9 @@ from sqlalchemy import select
 from app.models import User, UserProfile, UpdateUserRequest, BaseResponse
 from app.database import get_db
 from app.auth import get_current_user
+from app.purge import create_purge_job, start_purge_job
+from app.http_cache import PROFILE_NAMESPACE
+from app.route_cache import cache_route, invalidates, user_tag
 from typing import Dict, Any
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -31,6 +34,7 @@ async def get_or_create_user(db: AsyncSession, supabase_user: Dict[str, Any]) ->
     return user
 
 @router.get("/profile", response_model=UserProfile)
+@cache_route(ttl_seconds=300, tags=[user_tag(PROFILE_NAMESPACE)])
 async def get_user_profile(
     current_user: Dict[str, Any] = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
@@ -56,6 +60,7 @@ async def get_user_profile(
         )
 
 @router.put("/profile", response_model=UserProfile)
+@invalidates(user_tag(PROFILE_NAMESPACE))
 async def update_user_profile(
     update_data: UpdateUserRequest,
     current_user: Dict[str, Any] = Depends(get_current_user),
@@ -97,11 +102,12 @@ async def update_user_profile(
         )
 
 @router.delete("/profile", response_model=BaseResponse)
+@invalidates(user_tag(PROFILE_NAMESPACE))
 async def delete_user_account(
     current_user: Dict[str, Any] = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Deactivate user account (soft delete)"""
+    """Deactivate user account (soft delete) and purge its reply analytics"""
     try:
         user = await get_or_create_user(db, current_user)
         
@@ -109,6 +115,10 @@ async def delete_user_account(
         user.is_active = False
         await db.commit()
         
+        # Analytics history is removed in throttled chunks after the response
+        job = await create_purge_job(user.id, "deactivated_account")
+        start_purge_job(job, user.id, current_user["id"])
+        
         return BaseResponse(message="Account deactivated successfully")
         
     except Exception as e:
@@ -0,0 +1,99 @@
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import redis_cache
+from app.config import settings
+from app.database import detached_session
+from app.models import User, UserSettings
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_CACHE_PREFIX = "user_settings:"
+
+# Own L1 namespace so hot settings aren't evicted by other keys
+redis_cache.l1.configure(
+    SETTINGS_CACHE_PREFIX, settings.user_settings_l1_max_entries, settings.user_settings_l1_ttl_seconds
+)
+
+
+def settings_namespace(user_supabase_id: str) -> str:
+    """Generation counter of one user's cached settings (see RedisCache.bump_version).
+
+    Separate from the user_settings route tag, which @invalidates bumps after
+    the write-through has already stored its entry.
+    """
+    return f"{SETTINGS_CACHE_PREFIX}prompt:{user_supabase_id}"
+
+
+def settings_cache_key(user_supabase_id: str, version: int) -> str:
+    return f"{settings_namespace(user_supabase_id)}:v{version}"
+
+
+def writing_style_instruction(writing_style: Optional[str]) -> str:
+    if not writing_style:
+        return ""
+    return f"Important: Follow this custom writing style: {writing_style}. "
+
+
+def guardian_instruction(guardian_text: Optional[str]) -> str:
+    if not guardian_text:
+        return ""
+    return f"IMPORTANT - Do NOT: {guardian_text}. "
+
+
+def build_settings_entry(user_settings: Optional[UserSettings]) -> Dict[str, Any]:
+    """Cacheable view of a user's settings with prompt fragments pre-rendered (None = no row)."""
+    writing_style = user_settings.writing_style if user_settings else None
+    guardian_text = user_settings.guardian_text if user_settings else None
+    return {
+        "writing_style": writing_style,
+        "guardian_text": guardian_text,
+        "fragments": {
+            "writing_style": writing_style_instruction(writing_style),
+            "guardian": guardian_instruction(guardian_text),
+        },
+    }
+
+
+async def write_through_user_settings(user_supabase_id: str, user_settings: Optional[UserSettings]) -> None:
+    """Move the user's settings to a new generation and store the committed row there.
+
+    Call after the commit. A reader that loaded the old row stores it under
+    the previous generation, which nobody reads any more, so it cannot
+    overwrite this entry. None (settings deleted) is stored as a cached negative.
+    """
+    version = await redis_cache.bump_version(settings_namespace(user_supabase_id))
+    if version is None:
+        return  # No backend: readers go to the database
+    entry = build_settings_entry(user_settings) if user_settings else None
+    await redis_cache.store_cached(
+        settings_cache_key(user_supabase_id, version), entry, settings.user_settings_cache_ttl_seconds
+    )
+
+
+async def get_user_prompt_settings(db: AsyncSession, user_supabase_id: str) -> Dict[str, Any]:
+    """Settings entry for prompt building: L1, then Redis, then one DB query.
+
+    The entry is keyed on the user's settings generation, read in one GET first.
+
+    Users without a settings row are cached as negatives (shorter TTL) and get
+    the empty entry, so that common case doesn't reach Postgres on every generation.
+    """
+    async def load_entry() -> Optional[Dict[str, Any]]:
+        async with detached_session(db) as session:
+            result = await session.execute(
+                select(UserSettings)
+                .join(User, User.id == UserSettings.user_id)
+                .where(User.supabase_user_id == user_supabase_id)
+            )
+            user_settings = result.scalar_one_or_none()
+            return build_settings_entry(user_settings) if user_settings else None
+
+    (version,) = await redis_cache.get_versions(settings_namespace(user_supabase_id))
+    entry, _ = await redis_cache.cached(
+        settings_cache_key(user_supabase_id, version), settings.user_settings_cache_ttl_seconds, load_entry
+    )
+    return entry if entry is not None else build_settings_entry(None)
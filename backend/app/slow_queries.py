@@ -0,0 +1,195 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than SLOW_QUERY_THRESHOLD_MS are written as JSON lines to
+# SLOW_QUERY_LOG_FILE (rotated). A sample of slow SELECTs is re-run with
+# EXPLAIN (ANALYZE, BUFFERS) on a separate connection and the plan is logged
+# next to them under the same fingerprint. Fed by the hooks in query_stats.py.
+# The hooks run on the event loop, so file writes go through a queue to a
+# listener thread.
+
+# Quoted strings and bare numbers outside identifiers; placeholders ($1) stay
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?\b")
+EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+# Execution option marking our own EXPLAIN connections
+SKIP_OPTION = "skip_slow_log"
+
+slow_queries = counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_THRESHOLD_MS", ["route"])
+slow_query_explains = counter("db_slow_query_explains_total", "Sampled EXPLAIN captures by result", ["result"])
+
+_slow_log: Optional[logging.Logger] = None
+_slow_log_listener: Optional[QueueListener] = None
+_explain_engines: Dict[Any, Any] = {}  # sync engine -> AsyncEngine
+_explain_tasks: Set[asyncio.Task] = set()
+
+
+def normalize_sql(statement: str) -> str:
+    """Collapse whitespace and replace inline literals with ?, so equal shapes group together."""
+    statement = STRING_LITERAL.sub("?", statement)
+    statement = NUMBER_LITERAL.sub("?", statement)
+    return " ".join(statement.split())
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """Types and sizes only, never values."""
+    if isinstance(parameters, dict):
+        return {key: redact_parameters(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_parameters(value) for value in parameters]
+    if parameters is None:
+        return None
+    if isinstance(parameters, (str, bytes)):
+        return f"<{type(parameters).__name__} len={len(parameters)}>"
+    return f"<{type(parameters).__name__}>"
+
+
+def slow_log() -> logging.Logger:
+    """JSON-lines logger writing only to the rotating slow-query file, off the event loop."""
+    global _slow_log, _slow_log_listener
+    if _slow_log is None:
+        directory = os.path.dirname(settings.slow_query_log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(
+            settings.slow_query_log_file,
+            maxBytes=settings.slow_query_log_max_bytes,
+            backupCount=settings.slow_query_log_backup_count,
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        _slow_log_listener = QueueListener(records, handler)
+        _slow_log_listener.start()
+        log = logging.getLogger("humanreplies.slow_queries")
+        log.propagate = False
+        log.setLevel(logging.INFO)
+        log.addHandler(QueueHandler(records))
+        _slow_log = log
+    return _slow_log
+
+
+def close_slow_log() -> None:
+    """Flush queued entries and stop the writer thread (on shutdown)."""
+    global _slow_log, _slow_log_listener
+    if _slow_log_listener is not None:
+        _slow_log_listener.stop()
+        _slow_log_listener = None
+    if _slow_log is not None:
+        for handler in list(_slow_log.handlers):
+            _slow_log.removeHandler(handler)
+        _slow_log = None
+
+
+def _write(entry: Dict[str, Any]) -> None:
+    try:
+        slow_log().info(json.dumps(entry, default=str))
+    except Exception as e:  # pragma: no cover
+        logger.debug(f"Failed to write slow query log: {e}")
+
+
+def register_engine(async_engine) -> None:
+    """Allow EXPLAIN captures for statements run through this engine."""
+    _explain_engines[async_engine.sync_engine] = async_engine
+
+
+def unobserved(conn) -> bool:
+    """Whether this connection is one of our EXPLAIN captures."""
+    return bool(conn.get_execution_options().get(SKIP_OPTION))
+
+
+def observe(conn, statement: str, parameters: Any, seconds: float, route: str) -> None:
+    """Called for every statement; logs the slow ones and maybe schedules an EXPLAIN."""
+    if not settings.slow_query_threshold_ms or seconds * 1000 < settings.slow_query_threshold_ms:
+        return
+    if unobserved(conn):
+        return
+    normalized = normalize_sql(statement)
+    query_id = fingerprint(normalized)
+    slow_queries.inc(route=route)
+    logger.warning(f"Slow query {query_id} on {route}: {seconds * 1000:.0f}ms")
+    _write({
+        "type": "slow_query",
+        "at": datetime.utcnow().isoformat(),
+        "fingerprint": query_id,
+        "route": route,
+        "duration_ms": round(seconds * 1000, 1),
+        "sql": normalized,
+        "parameters": redact_parameters(parameters),
+    })
+
+    if (settings.slow_query_explain_sample_rate <= 0
+            or random.random() >= settings.slow_query_explain_sample_rate
+            or not EXPLAINABLE.match(statement)):  # ANALYZE executes the statement: reads only
+        return
+    if _explain_tasks:
+        slow_query_explains.inc(result="skipped_busy")
+        return
+    async_engine = _explain_engines.get(conn.engine)
+    if async_engine is None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    # Fresh context: the capture is not part of the request that triggered it
+    task = loop.create_task(
+        explain(async_engine, statement, parameters, query_id), context=contextvars.Context()
+    )
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+
+
+async def explain(async_engine, statement: str, parameters: Any, query_id: str) -> None:
+    """Re-run a slow SELECT under EXPLAIN (ANALYZE, BUFFERS) on its own connection and log the plan."""
+    try:
+        async with async_engine.connect() as conn:
+            # Not logged as slow itself, and its timeout is not a request's DatabaseTimeout
+            await conn.execution_options(**{SKIP_OPTION: True})
+            # Runs in its own transaction, bounded and rolled back
+            await conn.execute(text(
+                f"SET LOCAL statement_timeout = {int(settings.slow_query_explain_timeout_ms)}"
+            ))
+            result = await conn.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", _driver_parameters(parameters)
+            )
+            plan = result.scalar()
+            await conn.rollback()
+    except Exception as e:
+        slow_query_explains.inc(result="error")
+        logger.info(f"EXPLAIN for slow query {query_id} failed: {e}")
+        return
+    slow_query_explains.inc(result="captured")
+    _write({
+        "type": "explain",
+        "at": datetime.utcnow().isoformat(),
+        "fingerprint": query_id,
+        "plan": json.loads(plan) if isinstance(plan, str) else plan,
+    })
+
+
+def _driver_parameters(parameters: Any) -> Any:
+    """Parameters as the driver received them (positional for asyncpg)."""
+    if isinstance(parameters, list):
+        return tuple(parameters)
+    return parameters
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Compare cache codecs (app/cache_codecs.py): encode/decode time and bytes
+stored per value, for payloads shaped like what the API caches.
+
+Codecs whose optional package (orjson, msgpack, zstandard) isn't installed
+are skipped. No Redis needed: the encoded bytes are exactly what gets stored.
+Usage: python bench_cache_codecs.py [iterations]
+"""
+
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from app.cache_codecs import COMPRESSORS, SERIALIZERS, Codec
+
+def make_tone(name: str, sort_order: int, user_id=None):
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "display_name": name.title(),
+        "description": f"{name.title()} tone for replies",
+        "is_preset": user_id is None,
+        "is_active": True,
+        "sort_order": sort_order,
+        "user_id": user_id
+    }
+
+def make_stats(days: int):
+    today = datetime.utcnow().date()
+    return {
+        "total_replies": 48213,
+        "replies_by_service": {"x": 30211, "linkedin": 12004, "facebook": 5998},
+        "daily_activity": [
+            {"date": (today - timedelta(days=offset)).isoformat(), "count": 100 + offset * 7}
+            for offset in range(days)
+        ],
+    }
+
+PAYLOADS = {
+    "total count": 48213,
+    "preset tones (8)": [make_tone(f"preset{i}", i) for i in range(8)],
+    "tones + 40 custom": [make_tone(f"preset{i}", i) for i in range(8)]
+        + [make_tone(f"custom{i}", 1000, str(uuid.uuid4())) for i in range(40)],
+    "stats (365 days)": make_stats(365),
+}
+
+def codecs():
+    for serializer in SERIALIZERS:
+        yield Codec(serializer, "none")
+        for compression in COMPRESSORS:
+            yield Codec(serializer, compression, compress_min_bytes=0)
+
+def measure(codec: Codec, value, iterations: int):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        data = codec.encode(value)
+    encode_us = (time.perf_counter() - started) / iterations * 1e6
+    started = time.perf_counter()
+    for _ in range(iterations):
+        Codec.decode(data)
+    decode_us = (time.perf_counter() - started) / iterations * 1e6
+    assert Codec.decode(data) == value
+    return encode_us, decode_us, len(data)
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print("📦 Cache codec benchmark")
+    print("=" * 66)
+    print(f"   iterations={iterations} serializers={list(SERIALIZERS)} compression={list(COMPRESSORS)}")
+
+    for label, value in PAYLOADS.items():
+        print(f"\n   {label}")
+        print(f"   {'codec':<16} {'encode µs':>10} {'decode µs':>10} {'bytes':>9}")
+        for codec in codecs():
+            encode_us, decode_us, size = measure(codec, value, iterations)
+            print(f"   {codec.name:<16} {encode_us:10.1f} {decode_us:10.1f} {size:9d}")
+
+if __name__ == "__main__":
+    main()
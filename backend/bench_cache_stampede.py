@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Count loader invocations per key expiry under a concurrent burst: the plain
+get -> load -> set pattern versus RedisCache.cached (singleflight + Redis lock
++ early expiration), with and without stale-while-revalidate.
+
+Several RedisCache instances stand in for separate workers. Uses a scratch
+Redis database (default 15) and flushes it between runs.
+Usage: python bench_cache_stampede.py [workers] [callers_per_worker] [expiries] [redis_db]
+"""
+
+import asyncio
+import sys
+import time
+
+from app.config import settings
+
+TTL_SECONDS = 2
+LOAD_SECONDS = 0.2
+KEY = "bench:stampede"
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(LOAD_SECONDS)
+        return {"total": self.calls}
+
+async def naive(cache, loader):
+    value = await cache.get_json(KEY)
+    if value is None:
+        value = await loader()
+        await cache.set_json(KEY, value, TTL_SECONDS)
+    return value
+
+async def protected(cache, loader, stale_ttl_seconds=0):
+    value, _ = await cache.cached(KEY, TTL_SECONDS, loader, stale_ttl_seconds=stale_ttl_seconds)
+    return value
+
+async def run(label, caches, callers, expiries, call):
+    client = await caches[0].get_client()
+    await client.flushdb()
+    loader = Loader()
+    started = time.perf_counter()
+    for _ in range(expiries + 1):
+        await asyncio.gather(*[call(cache, loader) for cache in caches for _ in range(callers)])
+        # Let the key expire (TTL plus jitter headroom) before the next burst
+        await asyncio.sleep(TTL_SECONDS * (1 + settings.cache_ttl_jitter) + 0.1)
+    elapsed = time.perf_counter() - started
+    # The first burst is the cold load; every later one follows an expiry
+    print(f"   {label:<28} loader calls={loader.calls:>5}  per expiry={loader.calls / (expiries + 1):6.2f}  ({elapsed:.1f}s)")
+
+async def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    callers = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    expiries = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    settings.redis_db = int(sys.argv[4]) if len(sys.argv) > 4 else 15
+
+    from app.cache import RedisCache
+    caches = [RedisCache() for _ in range(workers)]
+    if not await caches[0].get_client():
+        print("Redis is not reachable; start it or set REDIS_HOST/REDIS_PORT")
+        return
+
+    print("🐘 Cache stampede benchmark")
+    print("=" * 50)
+    print(f"   workers={workers} callers/worker={callers} expiries={expiries} db={settings.redis_db}\n")
+
+    await run("get/load/set", caches, callers, expiries, naive)
+    await run("cached()", caches, callers, expiries, protected)
+    await run("cached(stale_ttl_seconds=60)", caches, callers, expiries,
+              lambda cache, loader: protected(cache, loader, stale_ttl_seconds=60))
+
+    client = await caches[0].get_client()
+    await client.flushdb()
+    for cache in caches:
+        await (await cache.get_client()).aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
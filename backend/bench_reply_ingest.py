@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark reply analytics ingestion: POST /replies/ (one event per request)
+versus POST /replies/batch. Run this against a running backend.
+
+Usage: python bench_reply_ingest.py [events] [batch_size] [concurrency]
+"""
+
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+
+BASE_URL = "http://localhost:8000/api/v1"
+# Anonymous batches are deduplicated per client
+CLIENT_ID = uuid.uuid4().hex
+
+def make_event():
+    return {
+        "service_type": "x",
+        "tone_type": "neutral",
+        "client_event_id": str(uuid.uuid4()),
+        "client_timestamp": datetime.utcnow().isoformat()
+    }
+
+async def bench_single(client: httpx.AsyncClient, events: int, concurrency: int) -> float:
+    """Events/sec through the one-request-per-event endpoint"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send():
+        async with semaphore:
+            response = await client.post(f"{BASE_URL}/replies/", json={"service_type": "x", "tone_type": "neutral"})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send() for _ in range(events)))
+    return events / (time.perf_counter() - start)
+
+async def bench_batch(client: httpx.AsyncClient, events: int, batch_size: int, concurrency: int) -> float:
+    """Events/sec through the batch endpoint"""
+    semaphore = asyncio.Semaphore(concurrency)
+    batches = [
+        [make_event() for _ in range(min(batch_size, events - offset))]
+        for offset in range(0, events, batch_size)
+    ]
+
+    async def send(batch):
+        async with semaphore:
+            response = await client.post(f"{BASE_URL}/replies/batch", json={"events": batch, "client_id": CLIENT_ID})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(batch) for batch in batches))
+    elapsed = time.perf_counter() - start
+
+    # Replaying the first batch must be a no-op
+    response = await client.post(f"{BASE_URL}/replies/batch", json={"events": batches[0], "client_id": CLIENT_ID})
+    data = response.json()
+    print(f"   Retry of first batch: accepted={data['accepted']} duplicates={data['duplicates']}")
+    return events / elapsed
+
+async def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    print("📈 Reply ingestion benchmark")
+    print("=" * 50)
+    print(f"   events={events} batch_size={batch_size} concurrency={concurrency}")
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        single_rate = await bench_single(client, events, concurrency)
+        print(f"\n   POST /replies/       {single_rate:10.1f} events/sec")
+        batch_rate = await bench_batch(client, events, batch_size, concurrency)
+        print(f"   POST /replies/batch  {batch_rate:10.1f} events/sec")
+        print(f"\n   Speedup: {batch_rate / single_rate:.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
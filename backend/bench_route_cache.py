@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Requests per second for a cached tone list served three ways, driven straight
+through the ASGI app (no network):
+
+- model:   cached dicts decoded, wrapped in TonesListResponse, then validated
+           and re-encoded by FastAPI (the old cache-hit path)
+- encoded: @cache_route hit, stored body bytes returned as-is
+- gzip/br: the same hit for a client sending Accept-Encoding (pre-compressed)
+
+Uses the configured cache backend (REDIS_ENABLED=false for the in-process one).
+Usage: python bench_route_cache.py [requests] [custom_tones]
+"""
+
+import asyncio
+import sys
+import time
+import uuid
+
+from fastapi import FastAPI
+
+from app.cache import redis_cache
+from app.models import TonesListResponse
+from app.route_cache import COMPRESSORS, cache_route
+
+def make_tones(custom: int):
+    tones = []
+    for i in range(8 + custom):
+        preset = i < 8
+        tones.append({
+            "id": str(uuid.uuid4()),
+            "name": f"tone_{i}",
+            "display_name": f"Tone {i}",
+            "description": f"Replies in the style of tone {i}, a little longer to look realistic",
+            "is_preset": preset,
+            "is_active": True,
+            "sort_order": i if preset else 1000,
+            "user_id": None if preset else str(uuid.uuid4())
+        })
+    return tones
+
+def build_app(tones):
+    app = FastAPI()
+
+    async def load():
+        return tones
+
+    @app.get("/model", response_model=TonesListResponse)
+    async def model_path():
+        value, _ = await redis_cache.cached("bench:route:model", 300, load)
+        return TonesListResponse(tones=value)
+
+    @app.get("/encoded", response_model=TonesListResponse)
+    @cache_route(ttl_seconds=300, vary=(), name="bench_encoded")
+    async def encoded_path():
+        return TonesListResponse(tones=tones)
+
+    return app
+
+async def call(app, path: str, accept_encoding: str = ""):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else [],
+        "client": ("bench", 0), "server": ("bench", 80),
+    }
+    chunks = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(chunks)
+
+async def run(label, app, path, requests, accept_encoding=""):
+    body = await call(app, path, accept_encoding)  # Warm the cache
+    started = time.perf_counter()
+    for _ in range(requests):
+        await call(app, path, accept_encoding)
+    elapsed = time.perf_counter() - started
+    print(f"   {label:<10} {requests / elapsed:9.0f} req/s  {elapsed / requests * 1e6:8.1f} µs/req  {len(body):7d} bytes")
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    custom = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    app = build_app(make_tones(custom))
+    client = await redis_cache.get_client()
+    if client:
+        await client.delete("bench:route:model")
+
+    print("⚡ Route cache encoding benchmark")
+    print("=" * 60)
+    print(f"   requests={requests} tones={8 + custom} backend={redis_cache.backend}\n")
+
+    await run("model", app, "/model", requests)
+    await run("encoded", app, "/encoded", requests)
+    for encoding in COMPRESSORS:
+        await run(encoding, app, "/encoded", requests, accept_encoding=encoding)
+
+if __name__ == "__main__":
+    asyncio.run(main())
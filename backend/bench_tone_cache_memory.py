@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Measure Redis memory for cached tone lists at scale: the old layout (full
+presets + custom tones copied into every user's entry) versus the composed
+layout (one shared preset entry + a small custom-tone entry per user).
+
+Uses a scratch Redis database (default 15) and flushes it between runs.
+Usage: python bench_tone_cache_memory.py [users] [custom_tones_per_user] [redis_db]
+"""
+
+import asyncio
+import json
+import sys
+import uuid
+
+import redis.asyncio as redis
+
+from app.config import settings
+
+PRESET_COUNT = 8
+PIPELINE_CHUNK = 1000
+
+def make_tone(name: str, sort_order: int, user_id=None):
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "display_name": name.title(),
+        "description": f"{name.title()} tone for replies",
+        "is_preset": user_id is None,
+        "is_active": True,
+        "sort_order": sort_order,
+        "user_id": user_id
+    }
+
+async def used_memory(client) -> int:
+    info = await client.info("memory")
+    return info["used_memory"]
+
+async def write_entries(client, entries):
+    for offset in range(0, len(entries), PIPELINE_CHUNK):
+        pipe = client.pipeline(transaction=False)
+        for key, value in entries[offset:offset + PIPELINE_CHUNK]:
+            pipe.set(key, json.dumps(value), ex=300)
+        await pipe.execute()
+
+async def measure(client, label: str, entries) -> int:
+    await client.flushdb()
+    baseline = await used_memory(client)
+    await write_entries(client, entries)
+    used = await used_memory(client) - baseline
+    print(f"   {label:<10} {len(entries):>8} keys  {used / 1024 / 1024:10.1f} MiB")
+    return used
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    custom_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    redis_db = int(sys.argv[3]) if len(sys.argv) > 3 else 15
+
+    client = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=redis_db)
+    presets = [make_tone(f"preset{i}", i) for i in range(PRESET_COUNT)]
+
+    print("🧠 Tone cache memory benchmark")
+    print("=" * 50)
+    print(f"   users={users} presets={PRESET_COUNT} custom_tones_per_user={custom_per_user} db={redis_db}\n")
+
+    old_entries = []
+    new_entries = [("tones:presets:v0", presets)]
+    for _ in range(users):
+        user_id = str(uuid.uuid4())
+        custom = [make_tone(f"custom{i}", 1000, user_id) for i in range(custom_per_user)]
+        old_entries.append((f"tones:user:{user_id}", {"tones": presets + custom}))
+        new_entries.append((f"tones:user:{user_id}:v0", custom))
+
+    old_bytes = await measure(client, "old", old_entries)
+    new_bytes = await measure(client, "composed", new_entries)
+    await client.flushdb()
+    await client.aclose()
+
+    print(f"\n   Saved {(old_bytes - new_bytes) / 1024 / 1024:.1f} MiB ({(1 - new_bytes / old_bytes) * 100:.0f}%)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
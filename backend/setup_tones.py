@@ -14,6 +14,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
 from app.database import AsyncSessionLocal
 from app.models import Tone
+from app.routers.tones import invalidate_preset_tone_cache
 
 # Default tones to insert
 DEFAULT_TONES = [
@@ -68,6 +69,7 @@ async def setup_tones():
             
             if new_tones_count > 0:
                 await db.commit()
+                await invalidate_preset_tone_cache()
                 print(f"\n✅ Successfully added {new_tones_count} new tones to the database")
             else:
                 print("\n✅ All default tones already exist in the database")
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from app.cache_codecs import COMPRESSORS, SERIALIZERS, Codec, CodecError, codec_from_settings
+
+VALUE = {"tones": [{"name": f"tone{i}", "display_name": "Tone é", "sort_order": i} for i in range(50)], "n": None}
+
+
+@pytest.mark.parametrize("serializer", sorted(SERIALIZERS))
+@pytest.mark.parametrize("compression", ["none"] + sorted(COMPRESSORS))
+def test_round_trip(serializer, compression):
+    codec = Codec(serializer, compression, compress_min_bytes=64)
+    encoded = codec.encode(VALUE)
+    assert encoded[0] < 0x20
+    assert Codec.decode(encoded) == VALUE
+
+
+def test_small_values_are_left_uncompressed():
+    encoded = Codec("json", "zlib", compress_min_bytes=1024).encode({"a": 1})
+    assert encoded[0] & 0b11 == 0
+    assert encoded[1:] == b'{"a":1}'
+
+
+def test_compression_is_recorded_in_the_header():
+    encoded = Codec("json", "zlib", compress_min_bytes=0).encode(VALUE)
+    assert encoded[0] & 0b11 == 1
+    assert len(encoded) < len(json.dumps(VALUE))
+
+
+def test_decode_ignores_the_reading_codecs_configuration():
+    written = Codec("json", "zlib", compress_min_bytes=0).encode(VALUE)
+    assert Codec("json").decode(written) == VALUE
+
+
+@pytest.mark.parametrize("legacy", [b'{"a": [1, 2]}', '{"a": [1, 2]}', b"[1, 2]", b'"text"', b"42"])
+def test_legacy_plain_json_still_decodes(legacy):
+    assert Codec.decode(legacy) == json.loads(legacy)
+
+
+@pytest.mark.parametrize("data", [b"", bytes([0x1F]) + b"x", bytes([0x05]) + b"not zlib"])
+def test_undecodable_values_raise_codec_error(data):
+    with pytest.raises(CodecError):
+        Codec.decode(data)
+
+
+def test_unavailable_codecs_fall_back():
+    codec = codec_from_settings("nonexistent", "nonexistent", 1024)
+    assert (codec.serializer, codec.compression) == ("json", "zlib")
+
+
+def test_auto_serializer_prefers_orjson():
+    expected = "orjson" if "orjson" in SERIALIZERS else "json"
+    assert codec_from_settings("auto", "none", 1024).serializer == expected
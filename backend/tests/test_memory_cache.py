@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app import memory_cache
+from app.memory_cache import ENTRY_OVERHEAD_BYTES, MemoryRedis
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(memory_cache.time, "monotonic", clock)
+    return clock
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_values_expire_after_their_ttl(clock):
+    client = MemoryRedis(max_bytes=10_000)
+    run(client.set("k", "v", ex=10))
+    clock.now += 9.9
+    assert run(client.get("k")) == b"v"
+    clock.now += 0.2
+    assert run(client.get("k")) is None
+    assert client.stats()["keys"] == 0
+
+
+def test_px_ttl_is_in_milliseconds(clock):
+    client = MemoryRedis(max_bytes=10_000)
+    run(client.set("k", "v", px=1500))
+    clock.now += 1.4
+    assert run(client.get("k")) == b"v"
+    clock.now += 0.2
+    assert run(client.get("k")) is None
+
+
+def test_set_ttls_are_capped_but_counters_are_not(clock):
+    client = MemoryRedis(max_bytes=10_000, max_ttl_seconds=60)
+    run(client.set("value", "v", ex=3600))
+    run(client.set("forever", "v"))
+    run(client.incrby("counter:ver"))
+    run(client.expire("counter:ver", 3600))
+    clock.now += 61
+    assert run(client.mget(["value", "forever"])) == [None, None]
+    assert run(client.get("counter:ver")) == b"1"
+
+
+def test_least_recently_used_keys_are_evicted_past_max_bytes(clock):
+    entry_size = len("k0") + 100 + ENTRY_OVERHEAD_BYTES
+    client = MemoryRedis(max_bytes=entry_size * 3)
+    for index in range(3):
+        run(client.set(f"k{index}", "x" * 100))
+    run(client.get("k0"))  # k1 is now the least recently used
+    run(client.set("k3", "x" * 100))
+    assert run(client.mget(["k0", "k1", "k2", "k3"])) == [b"x" * 100, None, b"x" * 100, b"x" * 100]
+    assert client.stats()["evictions"] == 1
+    assert client.stats()["used_bytes"] <= client.max_bytes
+
+
+def test_used_bytes_track_overwrites_and_deletes(clock):
+    client = MemoryRedis(max_bytes=10_000)
+    run(client.set("k", "x" * 10))
+    run(client.set("k", "x" * 30))
+    assert client.stats()["used_bytes"] == len("k") + 30 + ENTRY_OVERHEAD_BYTES
+    assert run(client.delete("k", "missing")) == 1
+    assert client.stats()["used_bytes"] == 0
+
+
+def test_a_single_oversized_value_is_kept(clock):
+    client = MemoryRedis(max_bytes=10)
+    run(client.set("big", "x" * 100))
+    assert run(client.get("big")) == b"x" * 100
+
+
+def test_set_nx_and_lock_release_only_by_owner(clock):
+    client = MemoryRedis(max_bytes=10_000)
+    assert run(client.acquire_lock("lock:k", "a", 1000))
+    assert not run(client.acquire_lock("lock:k", "b", 1000))
+    assert not run(client.release_lock("lock:k", "b"))
+    assert run(client.release_lock("lock:k", "a"))
+    clock.now += 0.5
+    assert run(client.acquire_lock("lock:k", "b", 1000))
+    clock.now += 1.1
+    assert run(client.acquire_lock("lock:k", "c", 1000))  # b's lock expired
+
+
+def test_pipeline_returns_errors_in_place(clock):
+    client = MemoryRedis(max_bytes=10_000)
+    run(client.pfadd("hll", "u1"))
+    pipe = client.pipeline()
+    pipe.set("k", "v").get("hll").get("k")
+    results = run(pipe.execute(raise_on_error=False))
+    assert results[0] is True
+    assert isinstance(results[1], TypeError)
+    assert results[2] == b"v"
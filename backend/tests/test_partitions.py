@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime
+
+from app import partitions
+from app.config import settings
+from app.partitions import add_months, month_start, months_between, partition_ddl
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement, parameters=None):
+        self.statements.append(str(statement))
+
+
+def test_month_start_truncates_to_first_instant():
+    assert month_start(datetime(2026, 10, 19, 14, 5, 12, 318)) == datetime(2026, 10, 1)
+
+
+def test_add_months_crosses_year_boundaries():
+    assert add_months(datetime(2026, 11, 1), 1) == datetime(2026, 12, 1)
+    assert add_months(datetime(2026, 12, 1), 1) == datetime(2027, 1, 1)
+    assert add_months(datetime(2026, 1, 1), -1) == datetime(2025, 12, 1)
+    assert add_months(datetime(2026, 3, 1), -27) == datetime(2023, 12, 1)
+
+
+def test_months_between_is_inclusive():
+    assert months_between(datetime(2026, 11, 30), datetime(2027, 1, 2)) == [
+        datetime(2026, 11, 1), datetime(2026, 12, 1), datetime(2027, 1, 1)
+    ]
+
+
+def test_partition_ddl_bounds_one_month():
+    ddl = partition_ddl(datetime(2026, 12, 15))
+    assert '"replies_2026_12"' in ddl
+    assert "FROM ('2026-12-01') TO ('2027-01-01')" in ddl
+
+
+def run_retention(monkeypatch, now, months, retention_months, action="detach"):
+    async def list_partitions(conn):
+        return [(f"replies_{month:%Y_%m}", month) for month in months]
+
+    monkeypatch.setattr(partitions, "list_reply_partitions", list_partitions)
+    monkeypatch.setattr(settings, "replies_retention_months", retention_months)
+    monkeypatch.setattr(settings, "replies_retention_action", action)
+    conn = RecordingConnection()
+    removed = asyncio.run(partitions.apply_retention(conn, now))
+    return removed, conn.statements
+
+
+def test_apply_retention_removes_only_months_entirely_before_the_cutoff(monkeypatch):
+    months = [datetime(2026, month, 1) for month in range(1, 11)]
+    # Keeping 3 months on Oct 19 means the cutoff is Jul 1: June is the last month removed
+    removed, statements = run_retention(monkeypatch, datetime(2026, 10, 19), months, 3)
+    assert removed == [f"replies_2026_{month:02d}" for month in range(1, 7)]
+    assert statements[0] == 'ALTER TABLE "replies" DETACH PARTITION "replies_2026_01"'
+
+
+def test_apply_retention_drop_action(monkeypatch):
+    removed, statements = run_retention(
+        monkeypatch, datetime(2026, 3, 1), [datetime(2025, 12, 1), datetime(2026, 1, 1)], 2, action="drop"
+    )
+    assert removed == ["replies_2025_12"]
+    assert statements == ['DROP TABLE "replies_2025_12"']
+
+
+def test_apply_retention_disabled(monkeypatch):
+    removed, statements = run_retention(monkeypatch, datetime(2026, 10, 19), [datetime(2020, 1, 1)], 0)
+    assert removed == [] and statements == []
@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+
+from app.query_timeouts import (
+    DatabaseTimeout, DbTimeouts, _handle_error, current_db_timeouts, database_timeout, without_db_timeouts
+)
+from app.slow_queries import SKIP_OPTION
+
+
+def raise_wrapped(inner: BaseException, explicit: bool) -> BaseException:
+    try:
+        try:
+            raise inner
+        except BaseException as e:
+            if explicit:
+                raise RuntimeError("handler catch-all") from e
+            raise RuntimeError("handler catch-all")
+    except RuntimeError as outer:
+        return outer
+
+
+def test_database_timeout_returns_the_exception_itself():
+    timeout = DatabaseTimeout("statement")
+    assert database_timeout(timeout) is timeout
+
+
+def test_database_timeout_unwraps_cause_and_context():
+    timeout = DatabaseTimeout("lock")
+    assert database_timeout(raise_wrapped(timeout, explicit=True)) is timeout
+    assert database_timeout(raise_wrapped(timeout, explicit=False)) is timeout
+
+
+def test_database_timeout_ignores_other_errors():
+    assert database_timeout(raise_wrapped(ValueError("nope"), explicit=True)) is None
+    assert database_timeout(None) is None
+
+
+def test_database_timeout_survives_exception_cycles():
+    first, second = ValueError("a"), ValueError("b")
+    first.__context__, second.__context__ = second, first
+    assert database_timeout(first) is None
+
+
+def test_database_timeout_carries_retry_after():
+    timeout = DatabaseTimeout("statement")
+    assert timeout.status_code == 503
+    assert "Retry-After" in timeout.headers
+
+
+def error_context(sqlstate, connection=None):
+    return SimpleNamespace(
+        original_exception=SimpleNamespace(sqlstate=sqlstate), connection=connection, statement="SELECT 1"
+    )
+
+
+def test_handle_error_maps_timeout_sqlstates():
+    assert _handle_error(error_context("57014")).kind == "statement"
+    assert _handle_error(error_context("55P03")).kind == "lock"
+    assert _handle_error(error_context("23505")) is None
+
+
+def test_handle_error_ignores_explain_connections():
+    with create_engine("sqlite://").connect() as conn:
+        conn.execution_options(**{SKIP_OPTION: True})
+        assert _handle_error(error_context("57014", conn)) is None
+
+
+def test_without_db_timeouts_clears_the_request_timeouts():
+    seen = []
+
+    @without_db_timeouts
+    async def job():
+        seen.append(current_db_timeouts.get())
+
+    async def request():
+        current_db_timeouts.set(DbTimeouts(100, 50))
+        await job()
+        return current_db_timeouts.get()
+
+    assert asyncio.run(request()) == DbTimeouts(100, 50)
+    assert seen == [None]
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.auth import get_optional_user
+from app.config import settings
+from app.database import get_db
+from app.main import app
+from app.routers.replies import clamp_event_timestamp
+
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+CLIENT_ID = "0123456789abcdef"
+
+
+def test_clamp_event_timestamp_defaults_to_now():
+    assert clamp_event_timestamp(None, NOW) == NOW
+
+
+def test_clamp_event_timestamp_keeps_recent_times():
+    recent = NOW - timedelta(hours=3)
+    assert clamp_event_timestamp(recent, NOW) == recent
+
+
+def test_clamp_event_timestamp_converts_aware_times_to_naive_utc():
+    aware = datetime(2026, 10, 19, 14, 0, tzinfo=timezone(timedelta(hours=2)))
+    assert clamp_event_timestamp(aware, NOW) == datetime(2026, 10, 19, 12, 0)
+
+
+def test_clamp_event_timestamp_future_beyond_skew_becomes_now(monkeypatch):
+    monkeypatch.setattr(settings, "replies_batch_max_clock_skew_seconds", 300)
+    assert clamp_event_timestamp(NOW + timedelta(seconds=299), NOW) == NOW + timedelta(seconds=299)
+    assert clamp_event_timestamp(NOW + timedelta(seconds=301), NOW) == NOW
+
+
+def test_clamp_event_timestamp_clamps_old_times_to_the_window(monkeypatch):
+    monkeypatch.setattr(settings, "replies_batch_max_event_age_days", 7)
+    assert clamp_event_timestamp(NOW - timedelta(days=30), NOW) == NOW - timedelta(days=7)
+
+
+class IngestSession:
+    """Just enough of a session for POST /replies/batch.
+
+    Emulates the ON CONFLICT DO NOTHING claim on (scope, client_event_id)
+    and records inserted replies.
+    """
+
+    def __init__(self):
+        self.claimed = set()
+        self.replies = []
+
+    async def execute(self, statement):
+        # Multi-row VALUES bind as <column>_m<row>
+        rows = {}
+        for key, value in statement.compile(dialect=postgresql.dialect()).params.items():
+            column, _, index = key.rpartition("_m")
+            rows.setdefault(int(index), {})[column] = value
+        rows = [rows[index] for index in sorted(rows)]
+        if statement.table.name == "reply_ingest_keys":
+            fresh = [row["client_event_id"] for row in rows if (row["scope"], row["client_event_id"]) not in self.claimed]
+            self.claimed.update((row["scope"], row["client_event_id"]) for row in rows)
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: fresh))
+        if statement.table.name == "replies":
+            self.replies.extend(rows)
+        return None
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+@pytest.fixture
+def ingest():
+    session = IngestSession()
+
+    async def override_db():
+        yield session
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_optional_user] = lambda: None
+    try:
+        yield TestClient(app), session
+    finally:
+        app.dependency_overrides.clear()
+
+
+def post_batch(client, event_ids, client_id=CLIENT_ID):
+    body = {"events": [{"service_type": "x", "client_event_id": event_id} for event_id in event_ids]}
+    if client_id:
+        body["client_id"] = client_id
+    return client.post("/api/v1/replies/batch", json=body)
+
+
+def test_batch_counts_repeats_within_a_batch_as_duplicates(ingest):
+    client, session = ingest
+    response = post_batch(client, ["a", "b", "a"])
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 2
+    assert response.json()["duplicates"] == 1
+    assert response.json()["accepted_event_ids"] == ["a", "b"]
+    assert len(session.replies) == 2
+
+
+def test_batch_retry_is_stored_once(ingest):
+    client, session = ingest
+    post_batch(client, ["a", "b"])
+    response = post_batch(client, ["a", "b", "c"])
+    assert response.json()["accepted_event_ids"] == ["c"]
+    assert response.json()["duplicates"] == 2
+    assert len(session.replies) == 3
+
+
+def test_anonymous_event_ids_are_scoped_per_client(ingest):
+    client, session = ingest
+    post_batch(client, ["a"])
+    response = post_batch(client, ["a"], client_id="fedcba9876543210")
+    assert response.json()["accepted"] == 1
+    assert len(session.replies) == 2
+
+
+def test_anonymous_batch_without_client_id_is_rejected(ingest):
+    client, session = ingest
+    assert post_batch(client, ["a"], client_id=None).status_code == 400
+    assert session.replies == []
@@ -0,0 +1,70 @@
+import base64
+import gzip
+
+import pytest
+
+from app.config import settings
+from app.route_cache import encode_body, negotiate_encoding, render_json
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "br"),  # Equal weights: server preference order
+    ("br;q=0.5, gzip", "gzip"),
+    ("GZIP;Q=0.8", "gzip"),
+    ("*", "br"),
+    ("*;q=0.2, br;q=0", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;q=abc", None),
+    ("deflate", None),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header, ["br", "gzip"]) == expected
+
+
+def test_negotiate_encoding_only_picks_available_codings():
+    assert negotiate_encoding("br, gzip;q=0.5", ["gzip"]) == "gzip"
+    assert negotiate_encoding("br", []) is None
+
+
+def test_encode_body_stores_smaller_compressed_variants(monkeypatch):
+    monkeypatch.setattr(settings, "route_cache_encodings", "gzip")
+    monkeypatch.setattr(settings, "route_cache_compress_min_bytes", 64)
+    value = {"tones": [{"name": "neutral", "sort_order": index} for index in range(50)]}
+    entry = encode_body(value)
+    assert entry["body"].encode("utf-8") == render_json(value)
+    assert gzip.decompress(base64.b64decode(entry["gzip"])) == render_json(value)
+    assert "br" not in entry
+
+
+def test_encode_body_skips_small_bodies(monkeypatch):
+    monkeypatch.setattr(settings, "route_cache_compress_min_bytes", 512)
+    assert set(encode_body({"a": 1})) == {"body"}
+
+
+def test_cached_bodies_are_filtered_by_the_response_model():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from pydantic import BaseModel
+
+    from app.route_cache import cache_route
+
+    class Public(BaseModel):
+        name: str
+
+    app = FastAPI()
+    calls = []
+
+    @app.get("/item", response_model=Public)
+    @cache_route(ttl_seconds=60, tags=["tests:item"], vary=())
+    async def item():
+        calls.append(1)
+        return {"name": "a", "secret": "b"}
+
+    client = TestClient(app)
+    assert client.get("/item").json() == {"name": "a"}
+    assert client.get("/item").json() == {"name": "a"}
+    assert len(calls) == 1
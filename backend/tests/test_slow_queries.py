@@ -0,0 +1,46 @@
+from app.slow_queries import fingerprint, normalize_sql, redact_parameters
+
+
+def test_normalize_sql_replaces_literals_and_collapses_whitespace():
+    statement = "SELECT *\n  FROM replies WHERE service_type = 'x''s'   AND count > 42 AND ratio < -0.5"
+    assert normalize_sql(statement) == "SELECT * FROM replies WHERE service_type = ? AND count > ? AND ratio < ?"
+
+
+def test_normalize_sql_keeps_placeholders_identifiers_and_qualified_names():
+    statement = "SELECT t1.id, replies_2026_10.x FROM replies_2026_10 t1 WHERE t1.user_id = $1 LIMIT $2"
+    assert normalize_sql(statement) == statement
+
+
+def test_equal_shapes_share_a_fingerprint():
+    first = normalize_sql("SELECT * FROM tones WHERE name = 'warm' LIMIT 1")
+    second = normalize_sql("SELECT *  FROM tones WHERE name = 'funny' LIMIT 10")
+    assert first == second
+    assert fingerprint(first) == fingerprint(second)
+    assert len(fingerprint(first)) == 12
+
+
+def test_redact_parameters_keeps_types_and_sizes_only():
+    redacted = redact_parameters({"email": "someone@example.com", "ids": [1, b"\x00\x01", None], "n": 2.5})
+    assert redacted == {"email": "<str len=19>", "ids": ["<int>", "<bytes len=2>", None], "n": "<float>"}
+
+
+def test_redact_parameters_positional():
+    assert redact_parameters(("secret", 7)) == ["<str len=6>", "<int>"]
+
+
+def test_observe_skips_explain_connections(monkeypatch):
+    from sqlalchemy import create_engine
+
+    from app import slow_queries
+    from app.config import settings
+
+    written = []
+    monkeypatch.setattr(slow_queries, "_write", written.append)
+    monkeypatch.setattr(settings, "slow_query_threshold_ms", 100)
+    monkeypatch.setattr(settings, "slow_query_explain_sample_rate", 0)
+    with create_engine("sqlite://").connect() as conn:
+        slow_queries.observe(conn, "SELECT 1", (), 0.05, "GET /fast")
+        slow_queries.observe(conn, "SELECT 1", (), 0.5, "GET /slow")
+        conn.execution_options(**{slow_queries.SKIP_OPTION: True})
+        slow_queries.observe(conn, "SELECT 1", (), 0.5, "GET /explain")
+    assert [entry["route"] for entry in written] == ["GET /slow"]